@@ -0,0 +1,111 @@
+import copy
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, Token
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from api.cache import LocalCache, user_role_version_key
+
+User = get_user_model()
+
+user_cache = LocalCache(maxsize=10000, timeout=60)
+ROLE_VERSION_TIMEOUT = user_cache.timeout
+
+ROLE_CLAIM = 'role'
+ROLE_VERSION_CLAIM = 'role_version'
+
+
+def get_access_token(user):
+    """Выдает токен доступа с ролью пользователя и версией его прав."""
+    token = AccessToken.for_user(user)
+    token['username'] = user.username
+    token[ROLE_CLAIM] = user.role
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token[ROLE_VERSION_CLAIM] = user.role_version
+    return token
+
+
+def get_role_version(user_id):
+    """Текущая версия прав пользователя или None, если его нет."""
+    key = user_role_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list(
+            'role_version', flat=True
+        ).first()
+        if version is not None:
+            cache.set(key, version, timeout=ROLE_VERSION_TIMEOUT)
+    return version
+
+
+class RoleTokenUser(TokenUser):
+    """Пользователь, восстановленный из утверждений токена.
+
+    Права вычисляются так же, как у модели User, но без обращения
+    к базе данных.
+    """
+
+    RoleChoices = User.RoleChoices
+    is_admin = User.is_admin
+    is_moderator = User.is_moderator
+
+    @property
+    def role(self):
+        return self.token.get(ROLE_CLAIM, User.RoleChoices.USER)
+
+
+def get_token_user(request):
+    """Пользователь для проверки прав: из токена, если в нем есть роль."""
+    if isinstance(request.auth, Token) and ROLE_CLAIM in request.auth:
+        return RoleTokenUser(request.auth)
+    return request.user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация с кешем пользователей и версий прав."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or ROLE_CLAIM not in validated_token:
+            return self.get_cached_user(validated_token)
+        version = get_role_version(user_id)
+        if version is None:
+            raise AuthenticationFailed(
+                _('User not found'), code='user_not_found'
+            )
+        if version != validated_token.get(ROLE_VERSION_CLAIM):
+            raise AuthenticationFailed(
+                'Права пользователя изменились, получите новый токен.',
+                code='role_changed'
+            )
+        return SimpleLazyObject(
+            lambda: self.get_cached_user(validated_token)
+        )
+
+    def get_cached_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        cached = user_cache.get(user_id)
+        if cached is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, copy.copy(user))
+            return user
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(cached.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."),
+                code='password_changed'
+            )
+        # Каждый запрос получает свою копию, чтобы изменения объекта
+        # во вьюхе не попадали в кеш.
+        return copy.copy(cached)
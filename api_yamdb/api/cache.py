@@ -0,0 +1,190 @@
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+CATALOG_VERSION_KEY = 'titles:catalog:version'
+
+
+class LocalCache:
+    """Потокобезопасный LRU-кеш в памяти процесса с временем жизни записей.
+
+    Каждый воркер хранит свою копию, поэтому записи, измененные в другом
+    процессе, устаревают не дольше чем на `timeout` секунд.
+    """
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def user_role_version_key(user_id):
+    return f'users:{user_id}:role_version'
+
+
+def title_reviews_version_key(title_id):
+    return f'titles:{title_id}:reviews:version'
+
+
+def review_comments_version_key(review_id):
+    return f'reviews:{review_id}:comments:version'
+
+
+def get_version(key):
+    """Возвращает текущую версию данных, хранящуюся в кеше.
+
+    Если версии нет (истек срок, кеш очищен или запись вытеснена), она
+    создается со случайным значением, чтобы не совпасть с одной из
+    прежних версий и не поднять из кеша устаревшие ответы.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(
+            key, random.getrandbits(48), settings.CACHE_VERSION_TIMEOUT
+        )
+        version = cache.get(key)
+    return version
+
+
+def get_last_modified(key):
+    """Возвращает время последней смены версии, если оно известно."""
+    return cache.get(f'{key}:modified')
+
+
+def bump_version(key):
+    """Увеличивает версию, делая недействительными ответы старой версии."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_version(key)
+    cache.set(
+        f'{key}:modified', timezone.now(), settings.CACHE_VERSION_TIMEOUT
+    )
+
+
+def bump_version_on_commit(key):
+    """Увеличивает версию после фиксации текущей транзакции.
+
+    До фиксации новые данные не видны другим запросам, и более ранняя
+    смена версии позволила бы им закешировать старый ответ под новой.
+    """
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def make_cache_key(prefix, version, params):
+    """Собирает ключ кеша из версии и нормализованных параметров запроса."""
+    normalized = urlencode(sorted(
+        (name, str(value)) for name, value in params
+    ))
+    digest = hashlib.md5(normalized.encode()).hexdigest()
+    return f'{prefix}:{version}:{digest}'
+
+
+def get_catalog_cache_key(request, paginator):
+    """Ключ кеша списка произведений для запроса и окна пагинации."""
+    window_params = (
+        paginator.limit_query_param, paginator.offset_query_param
+    )
+    params = [
+        (name, value)
+        for name in request.query_params
+        for value in request.query_params.getlist(name)
+        if name not in window_params
+        and (value != '' or name == paginator.cursor_query_param)
+    ]
+    params.append(('limit', paginator.get_limit(request)))
+    params.append(('offset', paginator.get_offset(request)))
+    params.append(('host', request.get_host()))
+    return make_cache_key(
+        'titles:list', get_version(CATALOG_VERSION_KEY), params
+    )
+
+
+def catalog_etag(request, *args, **kwargs):
+    return str(get_version(CATALOG_VERSION_KEY))
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return get_last_modified(CATALOG_VERSION_KEY)
+
+
+def reviews_etag(request, title_id, *args, **kwargs):
+    return str(get_version(title_reviews_version_key(title_id)))
+
+
+def reviews_last_modified(request, title_id, *args, **kwargs):
+    return get_last_modified(title_reviews_version_key(title_id))
+
+
+def comments_etag(request, title_id, review_id, *args, **kwargs):
+    return str(get_version(review_comments_version_key(review_id)))
+
+
+def comments_last_modified(request, title_id, review_id, *args, **kwargs):
+    return get_last_modified(review_comments_version_key(review_id))
+
+
+def get_title_summary_version(title_id):
+    """Версия сводки произведения: меняется вместе с каталогом и
+    списком отзывов произведения."""
+    return (
+        f'{get_version(CATALOG_VERSION_KEY)}:'
+        f'{get_version(title_reviews_version_key(title_id))}'
+    )
+
+
+def get_title_summary_cache_key(title_id):
+    return make_cache_key(
+        'titles:summary', get_title_summary_version(title_id),
+        [('id', title_id)]
+    )
+
+
+def title_summary_etag(request, pk, *args, **kwargs):
+    return get_title_summary_version(pk)
+
+
+def title_summary_last_modified(request, pk, *args, **kwargs):
+    modified = [
+        value for value in (
+            get_last_modified(CATALOG_VERSION_KEY),
+            get_last_modified(title_reviews_version_key(pk))
+        ) if value is not None
+    ]
+    return max(modified, default=None)
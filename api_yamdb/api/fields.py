@@ -0,0 +1,68 @@
+from django.utils.encoding import smart_str
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from api.cache import LocalCache
+
+slug_cache = LocalCache(maxsize=2048, timeout=60 * 5)
+
+
+class CachedManyRelatedField(serializers.ManyRelatedField):
+    """Список слагов, который проверяется одним запросом IN."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return self.child_relation.to_internal_value_many(data)
+
+
+class CachedSlugRelatedField(serializers.SlugRelatedField):
+    """Поле слага с кешем первичных ключей, без фильтров queryset."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return CachedManyRelatedField(**list_kwargs)
+
+    def get_cache_key(self, slug):
+        return (
+            self.get_queryset().model._meta.label, self.slug_field, slug
+        )
+
+    def to_internal_value(self, data):
+        return self.to_internal_value_many([data])[0]
+
+    def to_internal_value_many(self, data):
+        if not all(isinstance(slug, (str, int)) for slug in data):
+            self.fail('invalid')
+        slugs = [smart_str(slug) for slug in data]
+        found = {}
+        for slug in slugs:
+            pk = slug_cache.get(self.get_cache_key(slug))
+            if pk is not None:
+                found[slug] = pk
+        missing = set(slugs) - set(found)
+        queryset = self.get_queryset()
+        if missing:
+            for slug, pk in queryset.filter(
+                **{f'{self.slug_field}__in': missing}
+            ).values_list(self.slug_field, 'pk'):
+                slug = smart_str(slug)
+                slug_cache.set(self.get_cache_key(slug), pk)
+                found[slug] = pk
+        for slug in slugs:
+            if slug not in found:
+                self.fail(
+                    'does_not_exist', slug_name=self.slug_field, value=slug
+                )
+        # Для записи связей достаточно первичного ключа.
+        model = queryset.model
+        return [
+            model.from_db(queryset.db, [model._meta.pk.attname], [found[slug]])
+            for slug in slugs
+        ]
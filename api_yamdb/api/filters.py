@@ -1,24 +1,61 @@
 import django_filters as filters
+from django.db.models import Exists, OuterRef
 
-from reviews.models import Title
+from reviews.models import GenreTitle, Title
+from reviews.search import search_titles
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    """Фильтр по списку значений, перечисленных через запятую."""
 
 
 class TitleFilter(filters.FilterSet):
-    """Фильтр выборки произведений по определенным полям."""
+    """Фильтр выборки произведений по определенным полям.
+
+    Категории и жанры сравниваются по слагу точно. Для жанров
+    `genre_match=all` оставляет произведения со всеми перечисленными
+    жанрами, по умолчанию достаточно любого из них. Жанры проверяются
+    через EXISTS, поэтому произведения в выдаче не дублируются.
+    """
+
+    GENRE_MATCH_ANY = 'any'
+    GENRE_MATCH_ALL = 'all'
 
-    category = filters.CharFilter(
+    category = CharInFilter(
         field_name='category__slug',
-        lookup_expr='icontains'
+        lookup_expr='in'
     )
-    genre = filters.CharFilter(
-        field_name='genre__slug',
-        lookup_expr='icontains'
+    genre = CharInFilter(method='filter_genre')
+    genre_match = filters.ChoiceFilter(
+        choices=((GENRE_MATCH_ANY, 'Любой из жанров'),
+                 (GENRE_MATCH_ALL, 'Все жанры')),
+        method='filter_genre_match'
     )
     name = filters.CharFilter(
         field_name='name',
         lookup_expr='contains'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
-        fields = ('category', 'genre', 'name', 'year')
+        fields = ('category', 'genre', 'genre_match', 'name', 'year', 'search')
+
+    def filter_genre(self, queryset, name, value):
+        genre_titles = GenreTitle.objects.filter(title=OuterRef('pk'))
+        if self.form.cleaned_data.get('genre_match') == self.GENRE_MATCH_ALL:
+            for slug in set(value):
+                queryset = queryset.filter(
+                    Exists(genre_titles.filter(genre__slug=slug))
+                )
+            return queryset
+        return queryset.filter(
+            Exists(genre_titles.filter(genre__slug__in=value))
+        )
+
+    def filter_genre_match(self, queryset, name, value):
+        # Учитывается в filter_genre.
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_titles(queryset, value)
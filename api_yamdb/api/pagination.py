@@ -0,0 +1,125 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class LimitOffsetKeysetPagination(LimitOffsetPagination):
+    """Пагинация limit/offset с выборкой по ключу при параметре cursor."""
+
+    cursor_query_param = 'cursor'
+    keyset_max_limit = 100
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+        # Сортировку не по полям модели (например, по рангу поиска)
+        # выбрать по ключу нельзя.
+        if (self.cursor_query_param not in request.query_params
+                or not self.has_field_ordering()):
+            self.keyset = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset = True
+        self.request = request
+        self.limit = min(self.get_limit(request), self.keyset_max_limit)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+        rows = list(queryset.order_by(*self.ordering)[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last_row)
+        )
+
+    def get_ordering(self, queryset):
+        """Возвращает поля сортировки вместе с первичным ключом."""
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        pk_name = queryset.model._meta.pk.name
+        if not {pk_name, f'-{pk_name}', 'pk', '-pk'} & set(ordering):
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append(f'-{pk_name}' if descending else pk_name)
+        return ordering
+
+    def has_field_ordering(self):
+        try:
+            list(self.get_fields())
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    def get_fields(self):
+        model = self.model
+        for name in self.ordering:
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            field = (model._meta.pk if name == 'pk'
+                     else model._meta.get_field(name))
+            yield field, descending
+
+    def get_seek_filter(self, position):
+        """Строит условие «строго после позиции» для составного ключа."""
+        seek = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.get_fields(), position):
+            lookup = 'lt' if descending else 'gt'
+            seek |= equal & Q(**{f'{field.attname}__{lookup}': value})
+            equal &= Q(**{field.attname: value})
+        return seek
+
+    def encode_cursor(self, row):
+        if isinstance(row, dict):
+            # Строка values(): поля сортировки доступны по ключам.
+            row = SimpleNamespace(**row)
+        values = [
+            field.value_to_string(row) for field, _ in self.get_fields()
+        ]
+        return base64.urlsafe_b64encode(
+            json.dumps(values).encode()
+        ).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params[self.cursor_query_param]
+        if not encoded:
+            return None
+        fields = list(self.get_fields())
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [
+                field.to_python(value)
+                for (field, _), value in zip(fields, values)
+            ]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
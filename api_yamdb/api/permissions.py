@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 
 from rest_framework import permissions
 
+from api.authentication import get_token_user
+
 User = get_user_model()
 
 
@@ -9,19 +11,18 @@ class IsAdminOnly(permissions.BasePermission):
     """Право доступа только для администратора."""
 
     def has_permission(self, request, view):
-        return (request.user.is_authenticated
-                and request.user.is_admin)
+        user = get_token_user(request)
+        return user.is_authenticated and user.is_admin
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     """Право доступа администратора. Иначе доступно для чтения."""
 
     def has_permission(self, request, view):
-        return (
-            request.method in permissions.SAFE_METHODS
-            or request.user.is_authenticated
-            and request.user.is_admin
-        )
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        user = get_token_user(request)
+        return user.is_authenticated and user.is_admin
 
 
 class IsAdminAuthorModeratorOrReadOnly(permissions.BasePermission):
@@ -29,8 +30,9 @@ class IsAdminAuthorModeratorOrReadOnly(permissions.BasePermission):
     Иначе доступно для чтения."""
 
     def has_object_permission(self, request, view, obj):
-        return (request.method in permissions.SAFE_METHODS
-                or request.user.is_admin
-                or request.user.is_moderator
-                or obj.author == request.user
-                )
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        user = get_token_user(request)
+        return (user.is_admin
+                or user.is_moderator
+                or obj.author_id == user.id)
@@ -1,12 +1,20 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from rest_framework.validators import UniqueValidator
 
-from reviews.constants import (LIMIT_USERNAME_LENGTH,
+from api.cache import CATALOG_VERSION_KEY, bump_version_on_commit
+from api.fields import CachedSlugRelatedField, slug_cache
+from reviews.constants import (LIMIT_TITLES_BULK_CREATE,
+                               LIMIT_USERNAME_LENGTH,
                                LIMIT_USER_EMAIL_LENGTH)
-from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.models import (
+    Category, ChangeLogEntry, Comment, Genre, GenreTitle, Review, Title
+)
 
 User = get_user_model()
 
@@ -36,17 +44,83 @@ class TitleReadSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = (
+            'id', 'genre', 'category', 'rating', 'name', 'year', 'description'
+        )
+
+
+class TitleValuesSerializer:
+    """Сериализатор для быстрого чтения произведений из строк values().
+
+    Выводит те же данные, что и TitleReadSerializer, но не создает
+    экземпляры моделей и полей сериализаторов, а жанры всех переданных
+    произведений получает одним запросом.
+    """
+
+    value_fields = (
+        'id', 'name', 'year', 'description', 'category_id',
+        'category__name', 'category__slug', 'rating_sum', 'rating_count'
+    )
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def get_rows(cls, queryset):
+        return queryset.prefetch_related(None).values(*cls.value_fields)
+
+    def get_genres(self):
+        genres = {row['id']: [] for row in self.rows}
+        genre_titles = GenreTitle.objects.filter(
+            title_id__in=genres
+        ).order_by('genre__name').values_list(
+            'title_id', 'genre__name', 'genre__slug'
+        )
+        for title_id, name, slug in genre_titles:
+            genres[title_id].append({'name': name, 'slug': slug})
+        return genres
+
+    @staticmethod
+    def to_representation(row, genres):
+        category = None
+        if row['category_id'] is not None:
+            category = {
+                'name': row['category__name'],
+                'slug': row['category__slug']
+            }
+        rating = None
+        if row['rating_count']:
+            rating = row['rating_sum'] // row['rating_count']
+        return {
+            'id': row['id'],
+            'genre': genres,
+            'category': category,
+            'rating': rating,
+            'name': row['name'],
+            'year': row['year'],
+            'description': row['description']
+        }
+
+    @property
+    def data(self):
+        self.rows = list(self.rows)
+        if not self.rows:
+            return []
+        genres = self.get_genres()
+        return [
+            self.to_representation(row, genres[row['id']])
+            for row in self.rows
+        ]
 
 
 class TitleCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания произведения."""
 
-    category = serializers.SlugRelatedField(
+    category = CachedSlugRelatedField(
         slug_field='slug',
         queryset=Category.objects.all()
     )
-    genre = serializers.SlugRelatedField(
+    genre = CachedSlugRelatedField(
         slug_field='slug',
         many=True,
         queryset=Genre.objects.all(),
@@ -54,11 +128,133 @@ class TitleCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = ('id', 'name', 'year', 'description', 'genre', 'category')
+
+    missing_relation_message = (
+        'Категория или жанр были удалены, повторите запрос.'
+    )
+
+    def create(self, validated_data):
+        genres = validated_data.pop('genre')
+        try:
+            with transaction.atomic():
+                title = Title.objects.create(**validated_data)
+                title.genre.add(*genres)
+        except IntegrityError:
+            self.fail_missing_relation()
+        return title
+
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError:
+            self.fail_missing_relation()
+
+    def fail_missing_relation(self):
+        # Слаг мог остаться в кеше другого процесса после удаления
+        # объекта, и внешний ключ не прошел проверку при фиксации.
+        slug_cache.clear()
+        raise serializers.ValidationError({
+            api_settings.NON_FIELD_ERRORS_KEY: [
+                self.missing_relation_message
+            ]
+        })
 
     def to_representation(self, title):
-        serializer = TitleReadSerializer(title)
-        return serializer.data
+        # Поля возвращают только первичные ключи, поэтому ответ строится
+        # по записанным данным, прочитанным из базы.
+        rows = TitleValuesSerializer.get_rows(
+            Title.objects.filter(pk=title.pk)
+        )
+        return TitleValuesSerializer(rows).data[0]
+
+
+class TitleBulkListSerializer(serializers.ListSerializer):
+    """Массовое создание произведений.
+
+    Слаги категорий и жанров всех элементов проверяются двумя запросами,
+    произведения и их жанры создаются через bulk_create в одной
+    транзакции. Ошибки возвращаются списком по элементам запроса.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list) and len(data) > LIMIT_TITLES_BULK_CREATE:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    f'Не более {LIMIT_TITLES_BULK_CREATE} произведений '
+                    'за один запрос.'
+                ]
+            })
+        items = super().to_internal_value(data)
+        categories = dict(Category.objects.filter(
+            slug__in={item['category'] for item in items}
+        ).values_list('slug', 'id'))
+        genres = dict(Genre.objects.filter(
+            slug__in={slug for item in items for slug in item['genre']}
+        ).values_list('slug', 'id'))
+
+        errors = []
+        for item in items:
+            item_errors = {}
+            if item['category'] not in categories:
+                item_errors['category'] = [
+                    f'Категория {item["category"]} не найдена.'
+                ]
+            missing = [slug for slug in item['genre'] if slug not in genres]
+            if missing:
+                item_errors['genre'] = [
+                    f'Жанр {slug} не найден.' for slug in missing
+                ]
+            item['category'] = categories.get(item['category'])
+            item['genre'] = [genres.get(slug) for slug in item['genre']]
+            errors.append(item_errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def create(self, validated_data):
+        titles = [
+            Title(
+                name=item['name'],
+                year=item['year'],
+                description=item.get('description', ''),
+                category_id=item['category']
+            )
+            for item in validated_data
+        ]
+        with transaction.atomic():
+            titles = Title.objects.bulk_create(titles)
+            if titles and titles[0].pk is None:
+                # SQLite в Django 3.2 не возвращает ключи из bulk_create.
+                # Транзакция держит блокировку записи, поэтому созданные
+                # строки получили последние идентификаторы по порядку.
+                ids = Title.objects.order_by('-pk').values_list(
+                    'pk', flat=True
+                )[:len(titles)]
+                for title, pk in zip(titles, sorted(ids)):
+                    title.pk = pk
+            GenreTitle.objects.bulk_create(
+                GenreTitle(title_id=title.pk, genre_id=genre_id)
+                for title, item in zip(titles, validated_data)
+                for genre_id in dict.fromkeys(item['genre'])
+            )
+            # bulk_create не отправляет сигналы, кеш каталога
+            # сбрасывается явно.
+            bump_version_on_commit(CATALOG_VERSION_KEY)
+        return titles
+
+
+class TitleBulkCreateSerializer(serializers.ModelSerializer):
+    """Элемент массового создания произведений."""
+
+    category = serializers.SlugField()
+    genre = serializers.ListField(child=serializers.SlugField())
+
+    class Meta:
+        model = Title
+        fields = ('name', 'year', 'description', 'genre', 'category')
+        list_serializer_class = TitleBulkListSerializer
 
 
 class SignUpSerializer(serializers.Serializer):
@@ -137,11 +333,12 @@ class ReviewSerializer(serializers.ModelSerializer):
     score = serializers.IntegerField(
         validators=[MinValueValidator(1), MaxValueValidator(10)]
     )
+    comments_count = serializers.IntegerField(read_only=True, default=0)
 
     class Meta:
         model = Review
         fields = (
-            'id', 'text', 'author', 'score', 'pub_date'
+            'id', 'text', 'author', 'score', 'pub_date', 'comments_count'
         )
 
     def validate_score(self, value):
@@ -151,15 +348,58 @@ class ReviewSerializer(serializers.ModelSerializer):
             )
         return value
 
-    def validate(self, data):
-        request = self.context['request']
-        author = request.user
-        if request.method == 'POST' and Review.objects.filter(
-            title_id=self.context.get('view').kwargs.get('title_id'),
-            author=author
-        ).exists():
-            raise ValidationError('Может быть не более одного отзыва!')
-        return data
+    def create(self, validated_data):
+        # Повторный отзыв отсекает ограничение unique_author_title,
+        # отдельная проверка перед вставкой не нужна.
+        try:
+            return super().create(validated_data)
+        except IntegrityError:
+            if not Review.objects.filter(
+                title=validated_data['title'],
+                author=validated_data['author']
+            ).exists():
+                raise
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Может быть не более одного отзыва!'
+                ]
+            })
+
+
+class ReviewExportSerializer:
+    """Построчная выгрузка отзывов в формате NDJSON.
+
+    Читает строки values() итератором по `chunk_size` штук, поэтому
+    память не зависит от количества отзывов. Поля совпадают с полями
+    ReviewSerializer, кроме `comments_count`.
+    """
+
+    value_fields = ('id', 'text', 'author__username', 'score', 'pub_date')
+    chunk_size = 2000
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.pub_date_field = serializers.DateTimeField()
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'text': row['text'],
+            'author': row['author__username'],
+            'score': row['score'],
+            'pub_date': self.pub_date_field.to_representation(
+                row['pub_date']
+            )
+        }
+
+    def __iter__(self):
+        rows = self.queryset.order_by('pk').values(
+            *self.value_fields
+        ).iterator(chunk_size=self.chunk_size)
+        for row in rows:
+            yield json.dumps(
+                self.to_representation(row), ensure_ascii=False
+            ) + '\n'
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -172,3 +412,35 @@ class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ('id', 'text', 'author', 'pub_date')
+
+
+class ReviewCommentSerializer(serializers.ModelSerializer):
+    """Сериализатор комментария, вложенного в отзыв."""
+
+    author = serializers.CharField(source='author_username', read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ('id', 'text', 'author', 'pub_date')
+
+
+class ReviewWithCommentsSerializer(ReviewSerializer):
+    """Сериализатор отзыва с последними комментариями."""
+
+    comments = ReviewCommentSerializer(
+        many=True, read_only=True, source='latest_comments'
+    )
+
+    class Meta(ReviewSerializer.Meta):
+        fields = ReviewSerializer.Meta.fields + ('comments',)
+
+
+class ChangeLogEntrySerializer(serializers.ModelSerializer):
+    """Сериализатор записи журнала изменений."""
+
+    class Meta:
+        model = ChangeLogEntry
+        fields = (
+            'id', 'model', 'object_id', 'action', 'title_id', 'review_id',
+            'created_at'
+        )
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.authentication import ROLE_VERSION_TIMEOUT, user_cache
+from api.cache import (
+    CATALOG_VERSION_KEY, bump_version_on_commit, review_comments_version_key,
+    title_reviews_version_key, user_role_version_key
+)
+from api.fields import slug_cache
+from api.signup import signup_cache
+from reviews.changes import get_comment_title_id
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
+from reviews.ratings import is_deferred, ratings_recomputed
+
+CATALOG_MODELS = (Title, GenreTitle, Category, Genre)
+User = get_user_model()
+
+
+def invalidate_catalog(sender, **kwargs):
+    """Сбрасывает кеш списка произведений при изменении его данных."""
+    if kwargs.get('action', 'post_').startswith('post_'):
+        bump_version_on_commit(CATALOG_VERSION_KEY)
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(
+        invalidate_catalog, sender=model,
+        dispatch_uid=f'invalidate_catalog_save_{model.__name__}'
+    )
+    post_delete.connect(
+        invalidate_catalog, sender=model,
+        dispatch_uid=f'invalidate_catalog_delete_{model.__name__}'
+    )
+m2m_changed.connect(
+    invalidate_catalog, sender=Title.genre.through,
+    dispatch_uid='invalidate_catalog_genres'
+)
+ratings_recomputed.connect(
+    invalidate_catalog, dispatch_uid='invalidate_catalog_ratings'
+)
+
+
+@receiver((post_save, post_delete), sender=Review)
+def invalidate_reviews(sender, instance, **kwargs):
+    """Меняет версию списка отзывов произведения.
+
+    В режиме 'sync' отзыв сразу меняет рейтинг, поэтому сбрасывается и
+    кеш каталога. В режиме 'deferred' рейтинг меняется только после
+    пересчета, и каталог сбрасывается по сигналу ratings_recomputed.
+    """
+    bump_version_on_commit(title_reviews_version_key(instance.title_id))
+    if not is_deferred():
+        bump_version_on_commit(CATALOG_VERSION_KEY)
+
+
+@receiver((post_save, post_delete), sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    """Меняет версию списка комментариев к отзыву.
+
+    Комментарии входят в список отзывов произведения (`comments_count`,
+    `?include=comments`), поэтому меняется и версия этого списка.
+    """
+    bump_version_on_commit(review_comments_version_key(instance.review_id))
+    title_id = get_comment_title_id(instance)
+    if title_id is not None:
+        bump_version_on_commit(title_reviews_version_key(title_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_username(sender, instance, created, **kwargs):
+    """Меняет версии списков с отзывами и комментариями пользователя.
+
+    В них автор показан по username, поэтому после его смены прежние
+    ETag, закешированные сводки и `?include=comments` устаревают.
+    """
+    if created or not instance.username_changed():
+        return
+    title_ids = set(Review.objects.filter(
+        author=instance
+    ).values_list('title_id', flat=True))
+    for review_id, title_id in Comment.objects.filter(
+        author=instance
+    ).values_list('review_id', 'review__title_id').distinct():
+        bump_version_on_commit(review_comments_version_key(review_id))
+        title_ids.add(title_id)
+    for title_id in title_ids:
+        bump_version_on_commit(title_reviews_version_key(title_id))
+
+
+@receiver((post_save, post_delete), sender=Category)
+@receiver((post_save, post_delete), sender=Genre)
+def invalidate_slug_cache(sender, **kwargs):
+    """Очищает кеш слагов при изменении категорий и жанров."""
+    slug_cache.clear()
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_user_cache(sender, instance, signal, **kwargs):
+    """Удаляет пользователя из кешей аутентификации и регистрации и
+    обновляет версию его прав, с которой сверяются токены."""
+    user_cache.delete(instance.pk)
+    if signal is post_delete or not kwargs.get('created'):
+        # Прежние username и email могли освободиться.
+        transaction.on_commit(signup_cache.clear)
+    key = user_role_version_key(instance.pk)
+    if signal is post_delete:
+        transaction.on_commit(lambda: cache.delete(key))
+    else:
+        version = instance.role_version
+        transaction.on_commit(
+            lambda: cache.set(key, version, timeout=ROLE_VERSION_TIMEOUT)
+        )
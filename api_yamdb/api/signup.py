@@ -0,0 +1,81 @@
+"""Регистрация пользователей одним оператором INSERT без гонок."""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+
+from api.cache import LocalCache
+
+User = get_user_model()
+
+signup_cache = LocalCache(maxsize=100000, timeout=60)
+
+
+def supports_upsert_returning(db_connection=connection):
+    """Несколько ON CONFLICT и RETURNING поддерживает SQLite 3.35+."""
+    return (
+        db_connection.vendor == 'sqlite'
+        and db_connection.Database.sqlite_version_info >= (3, 35)
+    )
+
+
+def remember_user(username, email):
+    signup_cache.set(('username', username), email)
+    signup_cache.set(('email', email), username)
+
+
+def is_taken(username, email):
+    """Известно, что username или email занят другим пользователем."""
+    known_email = signup_cache.get(('username', username))
+    known_username = signup_cache.get(('email', email))
+    return (
+        known_email is not None and known_email != email
+        or known_username is not None and known_username != username
+    )
+
+
+def upsert_user(username, email):
+    """Создает пользователя или возвращает того, с кем конфликтует пара."""
+    opts = User._meta
+    user = User(username=username, email=email)
+    fields = [field for field in opts.concrete_fields if not field.primary_key]
+    quote = connection.ops.quote_name
+    username_column = quote(opts.get_field('username').column)
+    email_column = quote(opts.get_field('email').column)
+    sql = (
+        f'INSERT INTO {quote(opts.db_table)} '
+        f'({", ".join(quote(field.column) for field in fields)}) '
+        f'VALUES ({", ".join(["%s"] * len(fields))}) '
+        f'ON CONFLICT ({username_column}) DO UPDATE '
+        f'SET {username_column} = excluded.{username_column} '
+        f'ON CONFLICT ({email_column}) DO UPDATE '
+        f'SET {email_column} = excluded.{email_column} '
+        f'RETURNING '
+        f'{", ".join(quote(field.column) for field in opts.concrete_fields)}'
+    )
+    params = [
+        field.get_db_prep_save(field.pre_save(user, True), connection)
+        for field in fields
+    ]
+    # SET при конфликте не меняет строку, но возвращает ее в RETURNING.
+    # Список читается целиком: в режиме автофиксации SQLite фиксирует
+    # изменения только после завершения оператора.
+    return list(User.objects.raw(sql, params))[0]
+
+
+def register_user(username, email):
+    """Возвращает пользователя с этими username и email, создавая его
+    при необходимости, или None, если одно из значений уже занято."""
+    if is_taken(username, email):
+        return None
+    if supports_upsert_returning():
+        user = upsert_user(username, email)
+    else:
+        try:
+            user, _ = User.objects.get_or_create(
+                username=username, email=email
+            )
+        except IntegrityError:
+            return None
+    remember_user(user.username, user.email)
+    if (user.username, user.email) != (username, email):
+        return None
+    return user
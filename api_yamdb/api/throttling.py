@@ -0,0 +1,143 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.db import connection, transaction
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from api.signup import supports_upsert_returning
+from users.models import ThrottleCounter
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """Разбирает частоту в формате DRF ('10/min') в пару
+    (количество запросов, период в секундах)."""
+    if rate is None:
+        return None, None
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+def upsert_counter(key, period, expires_at):
+    """Учитывает запрос одним оператором INSERT ... ON CONFLICT ...
+    RETURNING и возвращает счетчики текущего и предыдущего периодов."""
+    opts = ThrottleCounter._meta
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    (key_column, period_column, count_column, previous_column,
+     expires_column) = (
+        quote(opts.get_field(name).column)
+        for name in ('key', 'period', 'count', 'previous', 'expires_at')
+    )
+    # Запрос с отстающими часами учитывается в текущем периоде строки.
+    sql = (
+        f'INSERT INTO {table} ({key_column}, {period_column}, '
+        f'{count_column}, {previous_column}, {expires_column}) '
+        f'VALUES (%s, %s, 1, 0, %s) '
+        f'ON CONFLICT ({key_column}) DO UPDATE SET '
+        f'{previous_column} = CASE '
+        f'WHEN {period_column} >= excluded.{period_column} '
+        f'THEN {previous_column} '
+        f'WHEN {period_column} = excluded.{period_column} - 1 '
+        f'THEN {count_column} ELSE 0 END, '
+        f'{count_column} = CASE '
+        f'WHEN {period_column} >= excluded.{period_column} '
+        f'THEN {count_column} + 1 ELSE 1 END, '
+        f'{period_column} = max({period_column}, excluded.{period_column}), '
+        f'{expires_column} = excluded.{expires_column} '
+        f'RETURNING {count_column}, {previous_column}'
+    )
+    params = [
+        key, period,
+        opts.get_field('expires_at').get_db_prep_save(expires_at, connection)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def lock_counter(key, period, expires_at):
+    """То же, что upsert_counter, для баз без ON CONFLICT ... RETURNING."""
+    with transaction.atomic():
+        ThrottleCounter.objects.get_or_create(
+            key=key, defaults={'period': period, 'expires_at': expires_at}
+        )
+        counter = ThrottleCounter.objects.select_for_update().get(key=key)
+        if counter.period < period:
+            counter.previous = (
+                counter.count if counter.period == period - 1 else 0
+            )
+            counter.count = 0
+            counter.period = period
+        counter.count += 1
+        counter.expires_at = expires_at
+        counter.save()
+    return counter.count, counter.previous
+
+
+def delete_expired_counters():
+    return ThrottleCounter.objects.filter(
+        expires_at__lt=datetime.now(timezone.utc)
+    ).delete()[0]
+
+
+class AuthRateThrottle(BaseThrottle):
+    """Скользящее окно запросов к аутентификации по IP и username."""
+
+    scope = 'auth'
+    timer = time.time
+
+    def get_username(self, request):
+        data = request.data
+        username = data.get('username') if hasattr(data, 'get') else None
+        return username if isinstance(username, str) and username else None
+
+    def get_idents(self, request):
+        yield 'ip', self.get_ident(request)
+        username = self.get_username(request)
+        if username is not None:
+            yield 'username', username
+
+    def get_counter_key(self, kind, ident):
+        digest = hashlib.md5(str(ident).encode()).hexdigest()
+        return f'{self.scope}:{kind}:{digest}'
+
+    def hit(self, key, period, duration):
+        """Учитывает запрос в общей для всех воркеров таблице счетчиков."""
+        expires_at = datetime.fromtimestamp(
+            (period + 2) * duration, timezone.utc
+        )
+        if supports_upsert_returning():
+            return upsert_counter(key, period, expires_at)
+        return lock_counter(key, period, expires_at)
+
+    def allow_request(self, request, view):
+        rates = api_settings.DEFAULT_THROTTLE_RATES or {}
+        now = self.timer()
+        self.wait_time = 0
+        allowed = True
+        for kind, ident in self.get_idents(request):
+            num, duration = parse_rate(rates.get(f'{self.scope}_{kind}'))
+            if num is None:
+                continue
+            period, elapsed = divmod(now / duration, 1)
+            count, previous = self.hit(
+                self.get_counter_key(kind, ident), int(period), duration
+            )
+            if previous * (1 - elapsed) + count <= num:
+                continue
+            allowed = False
+            if count < num and previous:
+                # Вес предыдущего периода снизится достаточно раньше конца
+                # текущего.
+                wait = 1 - (num - count) / previous - elapsed
+            else:
+                wait = 1 - elapsed
+            self.wait_time = max(self.wait_time, wait * duration)
+        return allowed
+
+    def wait(self):
+        return self.wait_time
@@ -4,7 +4,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     CategoryViewSet, CommentViewSet, GenreViewSet,
     ReviewViewSet, TitleViewSet, UserViewSet,
-    get_jwt_token, signup
+    changes, get_jwt_token, signup
 )
 
 app_name = 'api'
@@ -47,6 +47,7 @@ auth_path = [
 ]
 
 urlpatterns = [
+    path('v1/changes/', changes, name='changes'),
     path('v1/', include(v1_router.urls)),
     path('v1/auth/', include(auth_path)),
 ]
@@ -1,66 +1,85 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.db.models import Avg
-from django.db.utils import IntegrityError
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, status, viewsets
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework import filters, generics, status, viewsets
+from rest_framework.decorators import (
+    action, api_view, permission_classes, throttle_classes
+)
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import (
     AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
 )
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
-from rest_framework_simplejwt.tokens import AccessToken
 
+from api.authentication import get_access_token
+from api.cache import (
+    catalog_etag, catalog_last_modified, comments_etag, comments_last_modified,
+    get_catalog_cache_key, get_title_summary_cache_key, reviews_etag,
+    reviews_last_modified, title_summary_etag, title_summary_last_modified
+)
 from api.filters import TitleFilter
 from api.mixins import CreateListDestroyViewSet
+from api.pagination import LimitOffsetKeysetPagination
 from api.permissions import (
     IsAdminAuthorModeratorOrReadOnly, IsAdminOnly, IsAdminOrReadOnly
 )
 from api.serializers import (
-    CategorySerializer, CommentSerializer, GenreSerializer,
-    ReviewSerializer, SignUpSerializer, TitleCreateSerializer,
-    TitleReadSerializer, TokenSerializer, UserSerializer
+    CategorySerializer, ChangeLogEntrySerializer, CommentSerializer,
+    GenreSerializer, ReviewExportSerializer, ReviewSerializer,
+    ReviewWithCommentsSerializer, SignUpSerializer, TitleBulkCreateSerializer,
+    TitleCreateSerializer, TitleReadSerializer, TitleValuesSerializer,
+    TokenSerializer, UserSerializer
+)
+from api.signup import register_user
+from api.throttling import AuthRateThrottle
+from reviews.comments import annotate_comments_count, get_latest_comments
+from reviews.constants import (
+    CHANGES_PAGE_SIZE, MAX_CHANGES_PAGE_SIZE, MAX_SCORE, MIN_SCORE
 )
-from reviews.models import Category, Genre, Review, Title
+from reviews.models import Category, ChangeLogEntry, Genre, Review, Title
+from users.outbox import enqueue_email
 
 User = get_user_model()
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AuthRateThrottle])
 def signup(request):
     """Регистрация нового пользователя."""
     serializer = SignUpSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     username = serializer.validated_data['username']
     email = serializer.validated_data['email']
-    try:
-        user, _ = User.objects.get_or_create(
-            username=username,
-            email=email,
-        )
-
-        confirm_code = default_token_generator.make_token(user)
-        send_mail(
-            subject='Получение кода подтверждения',
-            message=f'Ваш код подтверждения: {confirm_code}.',
-            from_email=settings.EMAIL_ADMIN,
-            recipient_list=[user.email], )
-        return Response(serializer.data, status=status.HTTP_200_OK)
-
-    except IntegrityError:
+    user = register_user(username, email)
+    if user is None:
         return Response(
             'Нельзя использовать данный электронный адрес!',
             status=status.HTTP_400_BAD_REQUEST, )
 
+    confirm_code = default_token_generator.make_token(user)
+    # Письмо отправит команда send_outbox, запрос ее не ждет.
+    enqueue_email(
+        subject='Получение кода подтверждения',
+        message=f'Ваш код подтверждения: {confirm_code}.',
+        from_email=settings.EMAIL_ADMIN,
+        recipient=user.email, )
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AuthRateThrottle])
 def get_jwt_token(request):
     """Получение JWT-токена."""
     serializer = TokenSerializer(data=request.data)
@@ -70,13 +89,51 @@ def get_jwt_token(request):
     user = get_object_or_404(User, username=username)
 
     if default_token_generator.check_token(user, confirm_code):
-        token = str(AccessToken.for_user(user))
+        token = str(get_access_token(user))
         return Response({'token': token}, status=status.HTTP_200_OK)
     return Response(
         'Ошибка получения кода подтверждения. Попробуйте еще раз.',
         status=status.HTTP_400_BAD_REQUEST)
 
 
+def get_non_negative_param(request, name, default):
+    value = request.query_params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = -1
+    if value < 0:
+        raise ValidationError({name: ['Укажите неотрицательное целое число.']})
+    return value
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def changes(request):
+    """Лента изменений отзывов и комментариев.
+
+    `since` — идентификатор последней полученной записи, ответ содержит
+    не больше `limit` следующих записей в порядке их фиксации и курсор
+    `next` для следующего запроса.
+    """
+    since = get_non_negative_param(request, 'since', 0)
+    limit = min(
+        get_non_negative_param(request, 'limit', CHANGES_PAGE_SIZE)
+        or CHANGES_PAGE_SIZE,
+        MAX_CHANGES_PAGE_SIZE
+    )
+    entries = list(
+        ChangeLogEntry.objects.filter(id__gt=since)[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return Response({
+        'next': entries[-1].id if entries else since,
+        'has_more': has_more,
+        'results': ChangeLogEntrySerializer(entries, many=True).data
+    })
+
+
 class UserViewSet(ModelViewSet):
     """Вьюсет для работы с моделью User."""
 
@@ -96,7 +153,9 @@ class UserViewSet(ModelViewSet):
         url_path='me')
     def user_profile(self, request):
         """Редактирование собственной страницы."""
-        current_user = request.user
+        # Пользователь из кеша аутентификации может быть устаревшим:
+        # сохранение его копии вернуло бы в базу прежнюю роль.
+        current_user = get_object_or_404(User, pk=request.user.pk)
         if request.method == 'PATCH':
             serializer = UserSerializer(
                 current_user,
@@ -123,45 +182,198 @@ class GenreViewSet(CreateListDestroyViewSet):
     serializer_class = GenreSerializer
 
 
+catalog_condition = condition(
+    etag_func=catalog_etag, last_modified_func=catalog_last_modified
+)
+
+
+@method_decorator(catalog_condition, name='list')
+@method_decorator(catalog_condition, name='retrieve')
 class TitleViewSet(viewsets.ModelViewSet):
     """Вьюсет произведения."""
 
+    queryset = Title.objects.select_related(
+        'category'
+    ).prefetch_related('genre')
     permission_classes = (IsAdminOrReadOnly,)
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetKeysetPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TitleFilter
     http_method_names = ['get', 'post', 'head', 'options', 'patch', 'delete']
-
-    def get_queryset(self):
-        return Title.objects.all().annotate(rating=Avg('reviews__score'))
+    summary_reviews_limit = 5
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return TitleReadSerializer
+        if self.action == 'bulk':
+            return TitleBulkCreateSerializer
         return TitleCreateSerializer
 
+    def list(self, request, *args, **kwargs):
+        cache_key = get_catalog_cache_key(request, self.paginator)
+        data = cache.get(cache_key)
+        if data is None:
+            rows = TitleValuesSerializer.get_rows(
+                self.filter_queryset(self.get_queryset())
+            )
+            page = self.paginate_queryset(rows)
+            if page is None:
+                data = TitleValuesSerializer(rows).data
+            else:
+                data = self.get_paginated_response(
+                    TitleValuesSerializer(page).data
+                ).data
+            cache.set(cache_key, data, settings.TITLES_CACHE_TIMEOUT)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        rows = TitleValuesSerializer.get_rows(
+            self.filter_queryset(self.get_queryset())
+        )
+        row = generics.get_object_or_404(rows, pk=kwargs[self.lookup_field])
+        return Response(TitleValuesSerializer([row]).data[0])
+
+    @action(detail=True, methods=['get'])
+    @method_decorator(condition(
+        etag_func=title_summary_etag,
+        last_modified_func=title_summary_last_modified
+    ))
+    def summary(self, request, pk=None):
+        """Произведение, число отзывов и последние отзывы за три запроса."""
+        cache_key = get_title_summary_cache_key(pk)
+        data = cache.get(cache_key)
+        if data is None:
+            reviews_count = Review.objects.filter(
+                title=OuterRef('pk')
+            ).order_by().values('title').annotate(
+                total=Count('pk')
+            ).values('total')
+            rows = TitleValuesSerializer.get_rows(
+                Title.objects.all()
+            ).annotate(
+                reviews_count=Coalesce(Subquery(reviews_count), 0)
+            )
+            row = generics.get_object_or_404(rows, pk=pk)
+            reviews = annotate_comments_count(
+                Review.objects.filter(title_id=row['id']).select_related(
+                    'author'
+                )
+            )[:self.summary_reviews_limit]
+            data = TitleValuesSerializer([row]).data[0]
+            data['reviews_count'] = row['reviews_count']
+            data['reviews'] = ReviewSerializer(reviews, many=True).data
+            cache.set(cache_key, data, settings.TITLES_CACHE_TIMEOUT)
+        return Response(data)
+
+    @action(detail=True, methods=['get'], url_path='score-histogram')
+    def score_histogram(self, request, pk=None):
+        """Количество отзывов с каждой оценкой от 1 до 10."""
+        title = generics.get_object_or_404(Title.objects.only('pk'), pk=pk)
+        counts = dict(title.score_counts.values_list('score', 'count'))
+        return Response([
+            {'score': score, 'count': counts.get(score, 0)}
+            for score in range(MIN_SCORE, MAX_SCORE + 1)
+        ])
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=(IsAdminOnly,),
+        url_path='bulk')
+    def bulk(self, request):
+        """Массовое создание произведений."""
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        titles = serializer.save()
+        rows = TitleValuesSerializer.get_rows(
+            Title.objects.filter(
+                pk__in=[title.pk for title in titles]
+            ).order_by('pk')
+        )
+        return Response(
+            TitleValuesSerializer(rows).data, status=status.HTTP_201_CREATED
+        )
 
+
+@method_decorator(condition(
+    etag_func=reviews_etag, last_modified_func=reviews_last_modified
+), name='list')
 class ReviewViewSet(viewsets.ModelViewSet):
     """Вьюсет отзыва."""
 
     serializer_class = ReviewSerializer
     permission_classes = (IsAdminAuthorModeratorOrReadOnly,
                           IsAuthenticatedOrReadOnly)
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetKeysetPagination
     http_method_names = ['get', 'post', 'head', 'options', 'patch', 'delete']
+    default_comments_limit = 3
+    max_comments_limit = 20
 
     def get_title(self):
-        return get_object_or_404(Title, pk=self.kwargs['title_id'])
+        # Произведение запрашивается один раз за запрос.
+        if not hasattr(self, '_title'):
+            self._title = get_object_or_404(Title, pk=self.kwargs['title_id'])
+        return self._title
 
     def get_queryset(self):
         title = self.get_title()
-        return title.reviews.all()
+        return annotate_comments_count(title.reviews.select_related('author'))
 
     def perform_create(self, serializer):
         title = self.get_title()
         serializer.save(author=self.request.user, title=title)
 
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request, title_id=None):
+        """Потоковая выгрузка всех отзывов произведения в NDJSON."""
+        return StreamingHttpResponse(
+            ReviewExportSerializer(self.get_title().reviews.all()),
+            content_type='application/x-ndjson; charset=utf-8'
+        )
+
+    def get_comments_limit(self):
+        value = self.request.query_params.get('comments_limit')
+        if value is None:
+            return self.default_comments_limit
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_comments_limit:
+            raise ValidationError({'comments_limit': [
+                f'Укажите число от 1 до {self.max_comments_limit}.'
+            ]})
+        return limit
+
+    def list(self, request, *args, **kwargs):
+        """Список отзывов, с `?include=comments` — с комментариями.
+
+        Последние комментарии ко всем отзывам страницы выбираются одним
+        запросом, их количество задает `comments_limit`.
+        """
+        include = request.query_params.get('include', '').split(',')
+        if 'comments' not in include:
+            return super().list(request, *args, **kwargs)
+        limit = self.get_comments_limit()
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        reviews = list(queryset) if page is None else page
+        comments = get_latest_comments(
+            [review.pk for review in reviews], limit
+        )
+        for review in reviews:
+            review.latest_comments = comments[review.pk]
+        serializer = ReviewWithCommentsSerializer(
+            reviews, many=True, context=self.get_serializer_context()
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
 
+@method_decorator(condition(
+    etag_func=comments_etag, last_modified_func=comments_last_modified
+), name='list')
 class CommentViewSet(viewsets.ModelViewSet):
     """Вьюсет комментария."""
 
@@ -169,21 +381,22 @@ class CommentViewSet(viewsets.ModelViewSet):
     permission_classes = (
         IsAdminAuthorModeratorOrReadOnly, IsAuthenticatedOrReadOnly
     )
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetKeysetPagination
     http_method_names = ['get', 'post', 'head', 'options', 'patch', 'delete']
 
     def get_title_and_review(self):
-        title = self.kwargs.get('title_id')
-        review = get_object_or_404(
-            Review,
-            pk=self.kwargs['review_id'],
-            title=title
-        )
-        return review
+        # Отзыв запрашивается один раз за запрос.
+        if not hasattr(self, '_review'):
+            self._review = get_object_or_404(
+                Review,
+                pk=self.kwargs['review_id'],
+                title=self.kwargs.get('title_id')
+            )
+        return self._review
 
     def get_queryset(self):
         review = self.get_title_and_review()
-        return review.comments.all()
+        return review.comments.select_related('author')
 
     def perform_create(self, serializer):
         review = self.get_title_and_review()
@@ -60,9 +60,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Сколько секунд запрос ждет освобождения блокировки записи,
+        # прежде чем завершиться ошибкой «database is locked».
+        'OPTIONS': {'timeout': 30},
     }
 }
 
+# Для нескольких воркеров укажите общий кеш, например файловый:
+# 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+# 'LOCATION': BASE_DIR / 'cache',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+TITLES_CACHE_TIMEOUT = 60 * 5
+# Время жизни версий кеша и ETag. С кешем в памяти каждого воркера
+# изменения, сделанные другим воркером, видны не позже чем через него.
+CACHE_VERSION_TIMEOUT = 60
+
+# 'sync' — рейтинг и гистограмма оценок обновляются вместе с отзывом,
+# 'deferred' — произведение помечается к пересчету, который выполняет
+# команда run_rating_worker не реже раза в RATING_STALENESS_SECONDS.
+RATING_UPDATE_MODE = 'sync'
+RATING_STALENESS_SECONDS = 5
+RATING_WORKER_BATCH_SIZE = 500
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -104,8 +128,17 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ],
+    # Лимиты регистрации и получения токена
+    # (api.throttling.AuthRateThrottle): по IP-адресу и по username.
+    'DEFAULT_THROTTLE_RATES': {
+        'auth_ip': '60/min',
+        'auth_username': '10/min',
+    },
+    # IP-адрес клиента берется из REMOTE_ADDR, заголовку X-Forwarded-For
+    # не доверяем. За обратным прокси укажите количество прокси.
+    'NUM_PROXIES': 0,
 }
 
 SIMPLE_JWT = {
@@ -116,3 +149,11 @@ SIMPLE_JWT = {
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 EMAIL_ADMIN = 'admin@yamdb.ru'
+
+# Письма отправляются из таблицы OutboxEmail командой send_outbox.
+# Повторная попытка откладывается на EMAIL_OUTBOX_RETRY_DELAY секунд,
+# с каждой неудачей вдвое дольше.
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_POLL_INTERVAL = 5
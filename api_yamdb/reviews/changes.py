@@ -0,0 +1,33 @@
+"""Журнал изменений отзывов и комментариев."""
+from reviews.models import ChangeLogEntry, Comment, Review
+
+
+def get_comment_title_id(comment):
+    """Возвращает произведение комментария, запрашивая его не больше раза."""
+    if not hasattr(comment, '_title_id'):
+        if Comment.review.is_cached(comment):
+            comment._title_id = comment.review.title_id
+        else:
+            comment._title_id = Review.objects.filter(
+                pk=comment.review_id
+            ).values_list('title_id', flat=True).first()
+    return comment._title_id
+
+
+def log_change(instance, action):
+    """Добавляет в журнал запись об изменении отзыва или комментария."""
+    if isinstance(instance, Review):
+        entry = ChangeLogEntry(
+            model=ChangeLogEntry.REVIEW,
+            title_id=instance.title_id,
+            review_id=instance.pk
+        )
+    else:
+        entry = ChangeLogEntry(
+            model=ChangeLogEntry.COMMENT,
+            title_id=get_comment_title_id(instance),
+            review_id=instance.review_id
+        )
+    entry.object_id = instance.pk
+    entry.action = action
+    entry.save()
@@ -0,0 +1,50 @@
+"""Комментарии в выдаче отзывов."""
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery, Window
+from django.db.models.functions import Coalesce, RowNumber
+
+from reviews.models import Comment
+
+
+def annotate_comments_count(reviews):
+    """Добавляет отзывам количество комментариев `comments_count`.
+
+    Коррелированный подзапрос вместо GROUP BY позволяет читать отзывы
+    по индексу (title, -pub_date) без сортировки.
+    """
+    comments = Comment.objects.filter(
+        review=OuterRef('pk')
+    ).order_by().values('review').annotate(
+        total=Count('pk')
+    ).values('total')
+    return reviews.annotate(comments_count=Coalesce(Subquery(comments), 0))
+
+
+def get_latest_comments(review_ids, limit):
+    """Возвращает по `limit` самых новых комментариев к каждому отзыву.
+
+    Все комментарии выбираются одним запросом: ROW_NUMBER нумерует
+    комментарии внутри отзыва, а внешний запрос отбрасывает лишние.
+    Имя автора подставляется тем же запросом в `author_username`.
+    """
+    grouped = defaultdict(list)
+    if not review_ids:
+        return grouped
+    ranked = Comment.objects.filter(review_id__in=review_ids).annotate(
+        author_username=F('author__username'),
+        position=Window(
+            RowNumber(),
+            partition_by=[F('review_id')],
+            order_by=[F('pub_date').desc(), F('pk').desc()]
+        )
+    ).order_by()
+    sql, params = ranked.query.sql_with_params()
+    comments = Comment.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE ranked.position <= %s '
+        'ORDER BY ranked.review_id, ranked.position',
+        (*params, limit)
+    )
+    for comment in comments:
+        grouped[comment.review_id].append(comment)
+    return grouped
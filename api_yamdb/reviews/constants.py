@@ -7,3 +7,8 @@ LIMIT_USER_ROLE_LENTGH = 25
 LIMIT_NAME_LENGHT = 150
 LIMIT_CATEGORY_GENRE_NAME = 256
 TITLE_LIMIT = 30
+LIMIT_TITLES_BULK_CREATE = 1000
+MIN_SCORE = 1
+MAX_SCORE = 10
+CHANGES_PAGE_SIZE = 100
+MAX_CHANGES_PAGE_SIZE = 1000
@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from reviews.ratings import rebuild_score_histograms
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает гистограммы оценок всех произведений по отзывам.'
+
+    def handle(self, *args, **options):
+        written = rebuild_score_histograms()
+        self.stdout.write(self.style.SUCCESS(
+            f'Гистограммы пересчитаны, записано {written} счетчиков'
+        ))
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from reviews.ratings import process_dirty_titles
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг и гистограммы оценок произведений, '
+        'помеченных в режиме RATING_UPDATE_MODE = "deferred".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать все отметки и завершиться.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.RATING_WORKER_BATCH_SIZE,
+            help='Количество отметок в одной пачке.'
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            default=settings.RATING_STALENESS_SECONDS,
+            help='Пауза в секундах между проверками отметок.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                processed = process_dirty_titles(options['batch_size'])
+                total += processed
+                if processed < options['batch_size']:
+                    break
+            if total:
+                self.stdout.write(f'Обработано отметок: {total}')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Пересчет завершен'))
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# SQL скопирован из reviews.search на момент создания миграции, чтобы
+# последующие правки модуля не меняли ее.
+CREATE_SQL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS reviews_title_fts USING fts5('
+    "name, description, content='', tokenize='unicode61')",
+
+    'CREATE TRIGGER IF NOT EXISTS reviews_title_fts_ai '
+    'AFTER INSERT ON reviews_title BEGIN '
+    'INSERT INTO reviews_title_fts(rowid, name, description) '
+    "VALUES (new.id, replace(replace(new.name, 'ё', 'е'), 'Ё', 'Е'), "
+    "replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е')); END",
+
+    'CREATE TRIGGER IF NOT EXISTS reviews_title_fts_ad '
+    'AFTER DELETE ON reviews_title BEGIN '
+    'INSERT INTO reviews_title_fts(reviews_title_fts, rowid, name, '
+    "description) VALUES ('delete', old.id, "
+    "replace(replace(old.name, 'ё', 'е'), 'Ё', 'Е'), "
+    "replace(replace(old.description, 'ё', 'е'), 'Ё', 'Е')); END",
+
+    'CREATE TRIGGER IF NOT EXISTS reviews_title_fts_au '
+    'AFTER UPDATE OF name, description ON reviews_title BEGIN '
+    'INSERT INTO reviews_title_fts(reviews_title_fts, rowid, name, '
+    "description) VALUES ('delete', old.id, "
+    "replace(replace(old.name, 'ё', 'е'), 'Ё', 'Е'), "
+    "replace(replace(old.description, 'ё', 'е'), 'Ё', 'Е')); "
+    'INSERT INTO reviews_title_fts(rowid, name, description) '
+    "VALUES (new.id, replace(replace(new.name, 'ё', 'е'), 'Ё', 'Е'), "
+    "replace(replace(new.description, 'ё', 'е'), 'Ё', 'Е')); END",
+
+    "INSERT INTO reviews_title_fts(reviews_title_fts) VALUES ('delete-all')",
+
+    'INSERT INTO reviews_title_fts(rowid, name, description) '
+    "SELECT reviews_title.id, "
+    "replace(replace(reviews_title.name, 'ё', 'е'), 'Ё', 'Е'), "
+    "replace(replace(reviews_title.description, 'ё', 'е'), 'Ё', 'Е') "
+    'FROM reviews_title',
+)
+DROP_SQL = (
+    'DROP TRIGGER IF EXISTS reviews_title_fts_ai',
+    'DROP TRIGGER IF EXISTS reviews_title_fts_ad',
+    'DROP TRIGGER IF EXISTS reviews_title_fts_au',
+    'DROP TABLE IF EXISTS reviews_title_fts',
+)
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_title_rating'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(CREATE_SQL), run_sqlite(DROP_SQL)),
+    ]
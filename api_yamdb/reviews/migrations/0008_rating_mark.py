@@ -0,0 +1,27 @@
+# Generated by Django 3.2 on 2026-10-18 04:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_review_comment_pub_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingMark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title_id', models.BigIntegerField(db_index=True, verbose_name='Произведение')),
+                ('marked_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время отметки')),
+            ],
+            options={
+                'verbose_name': 'Отметка пересчета рейтинга',
+                'verbose_name_plural': 'Отметки пересчета рейтинга',
+                'ordering': ('id',),
+            },
+        ),
+    ]
@@ -2,12 +2,13 @@ from django.contrib.auth import get_user_model
 from django.core.validators import (
     MaxValueValidator, MinValueValidator
 )
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 from reviews.base_models import (
     BaseModelCategoryGenre, BaseModelReviewsComment
 )
-from reviews.constants import TITLE_LIMIT
+from reviews.constants import MAX_SCORE, MIN_SCORE, TITLE_LIMIT
 from reviews.validators import validate_year
 
 User = get_user_model()
@@ -52,6 +53,16 @@ class Title(models.Model):
         through='GenreTitle',
         verbose_name='Жанр'
     )
+    rating_sum = models.PositiveIntegerField(
+        'Сумма оценок',
+        default=0,
+        editable=False
+    )
+    rating_count = models.PositiveIntegerField(
+        'Количество оценок',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Произведение'
@@ -62,6 +73,13 @@ class Title(models.Model):
     def __str__(self):
         return self.name[:TITLE_LIMIT]
 
+    @property
+    def rating(self):
+        """Средняя оценка произведения, округленная вниз."""
+        if not self.rating_count:
+            return None
+        return self.rating_sum // self.rating_count
+
 
 class GenreTitle(models.Model):
     """Модель для связи жанра и произведения."""
@@ -106,6 +124,14 @@ class Review(BaseModelReviewsComment):
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
         default_related_name = 'reviews'
+        # Уникальный индекс ограничения (author, title) заодно покрывает
+        # проверку повторного отзыва.
+        indexes = (
+            models.Index(
+                fields=['title', '-pub_date', '-id'],
+                name='review_title_pub_date_idx'
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=['author', 'title'],
@@ -113,6 +139,81 @@ class Review(BaseModelReviewsComment):
             ),
         )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем оценку из базы, чтобы при изменении отзыва
+        # скорректировать рейтинг произведения на разницу.
+        instance._loaded_title_id = instance.__dict__.get('title_id')
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Рейтинг произведения и журнал изменений обновляются в post_save,
+        # поэтому сохраняем их вместе с отзывом в одной транзакции.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class TitleScoreCount(models.Model):
+    """Количество отзывов с данной оценкой на произведение.
+
+    Строки образуют гистограмму оценок и обновляются сигналами отзывов,
+    пересчитываются командой rebuild_score_histograms.
+    """
+
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        verbose_name='Произведение'
+    )
+    score = models.PositiveSmallIntegerField(
+        'Оценка',
+        validators=[
+            MinValueValidator(MIN_SCORE),
+            MaxValueValidator(MAX_SCORE)
+        ]
+    )
+    count = models.PositiveIntegerField('Количество отзывов', default=0)
+
+    class Meta:
+        verbose_name = 'Количество оценок'
+        verbose_name_plural = 'Гистограммы оценок'
+        default_related_name = 'score_counts'
+        ordering = ('title', 'score')
+        constraints = (
+            models.UniqueConstraint(
+                fields=['title', 'score'],
+                name='unique_title_score'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.title}: {self.score} — {self.count}'
+
+
+class RatingMark(models.Model):
+    """Отметка о том, что рейтинг произведения нужно пересчитать.
+
+    Используется в режиме RATING_UPDATE_MODE = 'deferred'. Отметки только
+    добавляются, каждое изменение отзыва — новой строкой, поэтому запись
+    отзывов одного произведения не конкурирует за общую строку. Повторные
+    отметки сливает process_dirty_titles. Внешнего ключа нет: отметка не
+    мешает каскадному удалению произведения и просто пропускается при
+    пересчете.
+    """
+
+    title_id = models.BigIntegerField('Произведение', db_index=True)
+    marked_at = models.DateTimeField('Время отметки', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Отметка пересчета рейтинга'
+        verbose_name_plural = 'Отметки пересчета рейтинга'
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'{self.title_id}: {self.marked_at}'
+
 
 class Comment(BaseModelReviewsComment):
     """Модель комментария."""
@@ -127,3 +228,55 @@ class Comment(BaseModelReviewsComment):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         default_related_name = 'comments'
+        indexes = (
+            models.Index(
+                fields=['review', '-pub_date', '-id'],
+                name='comment_review_pub_date_idx'
+            ),
+        )
+
+    def save(self, *args, **kwargs):
+        # Запись журнала изменений создается в post_save,
+        # поэтому сохраняем комментарий и запись в одной транзакции.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class ChangeLogEntry(models.Model):
+    """Запись журнала изменений отзывов и комментариев.
+
+    Журнал только дополняется, записи пишутся сигналами в транзакции
+    изменения. Возрастающий `id` служит курсором ленты изменений.
+    """
+
+    REVIEW = 'review'
+    COMMENT = 'comment'
+    MODEL_CHOICES = (
+        (REVIEW, 'Отзыв'),
+        (COMMENT, 'Комментарий'),
+    )
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = (
+        (CREATED, 'Создание'),
+        (UPDATED, 'Изменение'),
+        (DELETED, 'Удаление'),
+    )
+
+    model = models.CharField('Модель', max_length=16, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField('Идентификатор объекта')
+    action = models.CharField(
+        'Действие', max_length=16, choices=ACTION_CHOICES
+    )
+    title_id = models.BigIntegerField('Произведение', null=True)
+    review_id = models.BigIntegerField('Отзыв', null=True)
+    created_at = models.DateTimeField('Время изменения', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'{self.id}: {self.action} {self.model} {self.object_id}'
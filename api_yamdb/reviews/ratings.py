@@ -0,0 +1,172 @@
+"""Хранимый рейтинг и гистограмма оценок произведений.
+
+В режиме RATING_UPDATE_MODE = 'sync' они сдвигаются при каждом
+изменении отзыва. В режиме 'deferred' изменение отзыва только помечает
+произведение, а пересчет пачками выполняет process_dirty_titles
+(команда run_rating_worker).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from reviews.models import RatingMark, Review, Title, TitleScoreCount
+
+RATING_MODE_SYNC = 'sync'
+RATING_MODE_DEFERRED = 'deferred'
+
+# Отправляется после отложенного пересчета, аргумент title_ids.
+ratings_recomputed = Signal()
+
+
+def apply_rating_delta(title_id, score_delta, count_delta):
+    """Атомарно сдвигает сумму и количество оценок произведения."""
+    if not score_delta and not count_delta:
+        return
+    Title.objects.filter(pk=title_id).update(
+        rating_sum=F('rating_sum') + score_delta,
+        rating_count=F('rating_count') + count_delta
+    )
+
+
+def apply_score_delta(title_id, score, count_delta):
+    """Атомарно сдвигает счетчик оценки в гистограмме произведения."""
+    counter = TitleScoreCount.objects.filter(title_id=title_id, score=score)
+    if counter.update(count=F('count') + count_delta) or count_delta < 0:
+        return
+    # Первый отзыв с такой оценкой: строку счетчика могла успеть создать
+    # параллельная транзакция, поэтому конфликт вставки игнорируется.
+    TitleScoreCount.objects.bulk_create(
+        [TitleScoreCount(title_id=title_id, score=score)],
+        ignore_conflicts=True
+    )
+    counter.update(count=F('count') + count_delta)
+
+
+def is_deferred():
+    return settings.RATING_UPDATE_MODE == RATING_MODE_DEFERRED
+
+
+def mark_title_dirty(title_id):
+    """Помечает произведение к пересчету новой строкой отметки.
+
+    Существующие отметки не меняются, поэтому параллельные отзывы одного
+    произведения не блокируют друг друга.
+    """
+    RatingMark.objects.create(title_id=title_id)
+
+
+def review_saved(review, created):
+    """Учитывает в рейтинге и гистограмме созданный или измененный отзыв."""
+    old_title_id = getattr(review, '_loaded_title_id', None)
+    old_score = getattr(review, '_loaded_score', None)
+    if is_deferred():
+        if not created and old_title_id not in (None, review.title_id):
+            mark_title_dirty(old_title_id)
+        if created or old_score != review.score or (
+                old_title_id != review.title_id):
+            mark_title_dirty(review.title_id)
+    elif created:
+        apply_rating_delta(review.title_id, review.score, 1)
+        apply_score_delta(review.title_id, review.score, 1)
+    elif old_title_id is None or old_score is None:
+        # Прежние значения не загружались (отзыв получен через only() или
+        # defer()), и сдвиг неизвестен: произведение пересчитывается.
+        titles = Title.objects.filter(
+            pk__in={old_title_id, review.title_id} - {None}
+        )
+        rebuild_ratings(titles)
+        rebuild_score_histograms(titles)
+    elif old_title_id != review.title_id:
+        apply_rating_delta(old_title_id, -old_score, -1)
+        apply_rating_delta(review.title_id, review.score, 1)
+        apply_score_delta(old_title_id, old_score, -1)
+        apply_score_delta(review.title_id, review.score, 1)
+    else:
+        apply_rating_delta(review.title_id, review.score - old_score, 0)
+        if old_score != review.score:
+            apply_score_delta(review.title_id, old_score, -1)
+            apply_score_delta(review.title_id, review.score, 1)
+    review._loaded_title_id = review.title_id
+    review._loaded_score = review.score
+
+
+def review_deleted(review):
+    """Исключает удаленный отзыв из рейтинга и гистограммы."""
+    if is_deferred():
+        mark_title_dirty(review.title_id)
+        return
+    apply_rating_delta(review.title_id, -review.score, -1)
+    apply_score_delta(review.title_id, review.score, -1)
+
+
+def rebuild_ratings(titles=None):
+    """Пересчитывает рейтинг по отзывам одним UPDATE-запросом.
+
+    Возвращает количество обновленных произведений.
+    """
+    if titles is None:
+        titles = Title.objects.all()
+    reviews = Review.objects.filter(
+        title=OuterRef('pk')
+    ).order_by().values('title')
+    with transaction.atomic():
+        return titles.update(
+            rating_sum=Coalesce(
+                Subquery(reviews.annotate(total=Sum('score')).values('total')),
+                0
+            ),
+            rating_count=Coalesce(
+                Subquery(reviews.annotate(total=Count('pk')).values('total')),
+                0
+            )
+        )
+
+
+def rebuild_score_histograms(titles=None):
+    """Пересчитывает гистограммы оценок одним сгруппированным запросом.
+
+    Возвращает количество записанных счетчиков.
+    """
+    if titles is None:
+        titles = Title.objects.all()
+    counts = Review.objects.filter(title__in=titles).order_by().values(
+        'title', 'score'
+    ).annotate(total=Count('pk'))
+    with transaction.atomic():
+        TitleScoreCount.objects.filter(title__in=titles).delete()
+        return len(TitleScoreCount.objects.bulk_create(
+            TitleScoreCount(
+                title_id=row['title'], score=row['score'], count=row['total']
+            )
+            for row in counts
+        ))
+
+
+def process_dirty_titles(batch_size=None):
+    """Пересчитывает произведения из одной пачки отметок.
+
+    Отметки произведений пачки снимаются до пересчета и только не новее
+    последней прочитанной: отзыв, отметка которого снята, уже виден
+    пересчету, а отметка, добавленная позже, останется до следующей
+    пачки. Возвращает количество обработанных отметок.
+    """
+    batch_size = batch_size or settings.RATING_WORKER_BATCH_SIZE
+    marks = list(RatingMark.objects.order_by('id').values_list(
+        'id', 'title_id'
+    )[:batch_size])
+    if not marks:
+        return 0
+    title_ids = sorted({title_id for _, title_id in marks})
+    titles = Title.objects.filter(pk__in=title_ids)
+    with transaction.atomic():
+        RatingMark.objects.filter(
+            title_id__in=title_ids, id__lte=marks[-1][0]
+        ).delete()
+        rebuild_ratings(titles)
+        rebuild_score_histograms(titles)
+        transaction.on_commit(lambda: ratings_recomputed.send(
+            sender=Title, title_ids=title_ids
+        ))
+    return len(marks)
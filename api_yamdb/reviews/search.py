@@ -0,0 +1,134 @@
+"""Полнотекстовый поиск произведений на основе SQLite FTS5.
+
+Индекс хранится в contentless-таблице FTS5 и синхронизируется с
+таблицей произведений триггерами, поэтому учитывает и массовые операции
+(`bulk_create`, `QuerySet.update`), которые не отправляют сигналы.
+Токенизатор unicode61 приводит к одному регистру в том числе кириллицу,
+а «ё» дополнительно заменяется на «е» при индексации и в запросе.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'reviews_title_fts'
+TITLE_TABLE = 'reviews_title'
+# Совпадение в названии весит больше, чем в описании.
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def _fold(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _index_values(prefix):
+    return (
+        f'{prefix}.id, {_fold(f"{prefix}.name")}, '
+        f'{_fold(f"{prefix}.description")}'
+    )
+
+
+CREATE_TABLE_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    "name, description, content='', tokenize='unicode61')"
+)
+TRIGGERS_SQL = (
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai '
+    f'AFTER INSERT ON {TITLE_TABLE} BEGIN '
+    f'INSERT INTO {FTS_TABLE}(rowid, name, description) '
+    f'VALUES ({_index_values("new")}); END',
+
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad '
+    f'AFTER DELETE ON {TITLE_TABLE} BEGIN '
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) '
+    f"VALUES ('delete', {_index_values('old')}); END",
+
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au '
+    f'AFTER UPDATE OF name, description ON {TITLE_TABLE} BEGIN '
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) '
+    f"VALUES ('delete', {_index_values('old')}); "
+    f'INSERT INTO {FTS_TABLE}(rowid, name, description) '
+    f'VALUES ({_index_values("new")}); END',
+)
+REBUILD_SQL = (
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')",
+    f'INSERT INTO {FTS_TABLE}(rowid, name, description) '
+    f'SELECT {_index_values(TITLE_TABLE)} FROM {TITLE_TABLE}',
+)
+DROP_SQL = (
+    *(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}'
+      for suffix in ('ai', 'ad', 'au')),
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def is_supported(db_connection=connection):
+    return db_connection.vendor == 'sqlite'
+
+
+def ensure_search_index(db_connection=connection):
+    """Создает индекс и триггеры, если их нет, и переиндексирует данные.
+
+    SQLite удаляет триггеры вместе с таблицей, когда миграции пересоздают
+    таблицу произведений, поэтому проверка выполняется после каждого
+    migrate (см. ReviewsConfig.ready).
+    """
+    if not is_supported(db_connection):
+        return
+    with db_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+            'AND name LIKE %s',
+            [f'{FTS_TABLE}_%'],
+        )
+        if cursor.fetchone()[0] == len(TRIGGERS_SQL):
+            return
+        for sql in (CREATE_TABLE_SQL, *TRIGGERS_SQL, *REBUILD_SQL):
+            cursor.execute(sql)
+
+
+def drop_search_index(db_connection=connection):
+    if not is_supported(db_connection):
+        return
+    with db_connection.cursor() as cursor:
+        for sql in DROP_SQL:
+            cursor.execute(sql)
+
+
+def build_match_expression(query):
+    """Превращает пользовательский ввод в безопасное выражение MATCH.
+
+    Каждое слово ищется как префикс, все слова должны присутствовать.
+    """
+    words = re.findall(r'\w+', query.replace('ё', 'е').replace('Ё', 'Е'))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_titles(queryset, query):
+    """Фильтрует произведения по запросу и сортирует их по BM25."""
+    match = build_match_expression(query)
+    if not match:
+        return queryset.none()
+    if not is_supported():
+        words = re.findall(r'\w+', query)
+        condition = Q()
+        for word in words:
+            condition &= (
+                Q(name__icontains=word) | Q(description__icontains=word)
+            )
+        return queryset.filter(condition)
+    match_sql = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    # bm25() доступна только внутри запроса с MATCH, поэтому ранг
+    # вычисляется подзапросом по строке индекса найденного произведения.
+    rank_sql = (
+        f'SELECT bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) '
+        f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+        f'AND {FTS_TABLE}.rowid = {TITLE_TABLE}.id'
+    )
+    return queryset.filter(
+        pk__in=RawSQL(match_sql, (match,))
+    ).annotate(
+        search_rank=RawSQL(rank_sql, (match,), output_field=FloatField())
+    ).order_by('search_rank', '-year', 'name')
@@ -0,0 +1,42 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from reviews.changes import log_change
+from reviews.models import ChangeLogEntry, Comment, Review
+from reviews.ratings import review_deleted, review_saved
+from reviews.search import ensure_search_index
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_review_save(sender, instance, created, raw, **kwargs):
+    """Обновляет рейтинг произведения после сохранения отзыва."""
+    if not raw:
+        review_saved(instance, created)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_review_delete(sender, instance, **kwargs):
+    """Обновляет рейтинг произведения после удаления отзыва."""
+    review_deleted(instance)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Comment)
+def log_save(sender, instance, created, raw, **kwargs):
+    """Записывает в журнал создание или изменение объекта."""
+    if not raw:
+        log_change(instance, ChangeLogEntry.CREATED if created
+                   else ChangeLogEntry.UPDATED)
+
+
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=Comment)
+def log_delete(sender, instance, **kwargs):
+    """Записывает в журнал удаление объекта."""
+    log_change(instance, ChangeLogEntry.DELETED)
+
+
+def restore_search_index(sender, using, **kwargs):
+    """Восстанавливает триггеры поиска после пересоздания таблиц."""
+    ensure_search_index(connections[using])
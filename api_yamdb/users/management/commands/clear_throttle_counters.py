@@ -0,0 +1,10 @@
+from django.core.management import BaseCommand
+
+from api.throttling import delete_expired_counters
+
+
+class Command(BaseCommand):
+    help = 'Удаляет устаревшие счетчики ограничения частоты запросов.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Удалено счетчиков: {delete_expired_counters()}')
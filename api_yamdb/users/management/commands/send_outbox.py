@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management import BaseCommand
+
+from users.outbox import get_outbox_depth, send_outbox_batch
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди исходящих писем.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Отправить готовые письма и завершиться.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Количество писем в одной пачке.'
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            default=settings.EMAIL_OUTBOX_POLL_INTERVAL,
+            help='Пауза в секундах между проверками очереди.'
+        )
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        while True:
+            sent = failed = 0
+            while True:
+                batch_sent, batch_failed = send_outbox_batch(
+                    connection, options['batch_size']
+                )
+                sent += batch_sent
+                failed += batch_failed
+                if batch_sent + batch_failed < options['batch_size']:
+                    break
+            if sent or failed or options['once']:
+                self.stdout.write(
+                    f'Отправлено: {sent}, с ошибкой: {failed}, '
+                    f'в очереди: {get_outbox_depth()}'
+                )
+            if options['once']:
+                break
+            time.sleep(options['interval'])
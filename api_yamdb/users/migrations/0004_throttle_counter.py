@@ -0,0 +1,27 @@
+# Generated by Django 3.2 on 2026-10-18 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_outbox_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleCounter',
+            fields=[
+                ('key', models.CharField(max_length=150, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('period', models.BigIntegerField(verbose_name='Номер периода')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Запросов за период')),
+                ('previous', models.PositiveIntegerField(default=0, verbose_name='Запросов за предыдущий период')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Действует до')),
+            ],
+            options={
+                'verbose_name': 'Счетчик запросов',
+                'verbose_name_plural': 'Счетчики запросов',
+            },
+        ),
+    ]
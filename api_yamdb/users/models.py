@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 from reviews.constants import (
     LIMIT_USERNAME_LENGTH,
@@ -34,6 +35,15 @@ class User(AbstractUser):
         'Биография',
         blank=True,
     )
+    role_version = models.PositiveIntegerField(
+        'Версия прав доступа',
+        default=0,
+        editable=False
+    )
+
+    # Поля, от которых зависят права доступа. Их изменение увеличивает
+    # role_version, и выданные ранее токены перестают приниматься.
+    ACCESS_FIELDS = ('role', 'is_superuser', 'is_staff', 'is_active')
 
     @property
     def is_admin(self):
@@ -58,3 +68,73 @@ class User(AbstractUser):
 
     def __str__(self):
         return f'{self.username} ({self.role})'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_access = instance.get_access_state()
+        instance._loaded_username = instance.__dict__.get('username')
+        return instance
+
+    def get_access_state(self):
+        return tuple(self.__dict__.get(name) for name in self.ACCESS_FIELDS)
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_access', None)
+        if loaded is not None and loaded != self.get_access_state():
+            self.role_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'role_version'}
+        super().save(*args, **kwargs)
+        self._loaded_access = self.get_access_state()
+        self._loaded_username = self.username
+
+    def username_changed(self):
+        """username изменен после загрузки из базы (до конца save)."""
+        loaded = getattr(self, '_loaded_username', None)
+        return loaded is not None and loaded != self.username
+
+
+class OutboxEmail(models.Model):
+    """Письмо, ожидающее отправки командой send_outbox."""
+
+    subject = models.CharField('Тема', max_length=255)
+    message = models.TextField('Текст')
+    from_email = models.EmailField('Отправитель')
+    recipient = models.EmailField('Получатель')
+    created_at = models.DateTimeField('Создано', auto_now_add=True)
+    next_attempt_at = models.DateTimeField(
+        'Следующая попытка',
+        default=timezone.now,
+        db_index=True
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        ordering = ('next_attempt_at', 'id')
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
+
+
+class ThrottleCounter(models.Model):
+    """Счетчик запросов для ограничения частоты (api.throttling)."""
+
+    key = models.CharField('Ключ', max_length=150, primary_key=True)
+    period = models.BigIntegerField('Номер периода')
+    count = models.PositiveIntegerField('Запросов за период', default=0)
+    previous = models.PositiveIntegerField(
+        'Запросов за предыдущий период', default=0
+    )
+    expires_at = models.DateTimeField('Действует до', db_index=True)
+
+    class Meta:
+        verbose_name = 'Счетчик запросов'
+        verbose_name_plural = 'Счетчики запросов'
+
+    def __str__(self):
+        return f'{self.key}: {self.count}'
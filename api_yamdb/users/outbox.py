@@ -0,0 +1,83 @@
+"""Очередь исходящих писем.
+
+Вьюхи только добавляют письмо в таблицу OutboxEmail, а отправляет его
+команда send_outbox. Рассчитано на один процесс отправки: строки пачки
+не блокируются, чтобы не держать транзакцию на время работы с почтой.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from users.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(subject, message, from_email, recipient):
+    return OutboxEmail.objects.create(
+        subject=subject,
+        message=message,
+        from_email=from_email,
+        recipient=recipient
+    )
+
+
+def get_pending():
+    return OutboxEmail.objects.filter(
+        attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    )
+
+
+def get_outbox_depth():
+    """Количество писем, ожидающих отправки, включая отложенные."""
+    return get_pending().count()
+
+
+def send_outbox_batch(connection=None, batch_size=None):
+    """Отправляет одну пачку готовых к отправке писем.
+
+    Все письма пачки уходят через одно соединение. Отправленные письма
+    удаляются, для остальных следующая попытка откладывается. Возвращает
+    количество отправленных и неотправленных писем.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    emails = list(get_pending().filter(
+        next_attempt_at__lte=timezone.now()
+    )[:batch_size])
+    if not emails:
+        return 0, 0
+    connection = connection or get_connection()
+    sent_ids = []
+    failed = []
+    with connection:
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.message,
+                from_email=email.from_email,
+                to=[email.recipient],
+                connection=connection
+            )
+            try:
+                message.send()
+            except Exception as error:
+                logger.warning(
+                    'Не удалось отправить письмо %s: %s', email.pk, error
+                )
+                email.attempts += 1
+                email.last_error = str(error)
+                email.next_attempt_at = timezone.now() + timedelta(
+                    seconds=settings.EMAIL_OUTBOX_RETRY_DELAY
+                    * 2 ** (email.attempts - 1)
+                )
+                failed.append(email)
+            else:
+                sent_ids.append(email.pk)
+    OutboxEmail.objects.filter(pk__in=sent_ids).delete()
+    OutboxEmail.objects.bulk_update(
+        failed, ('attempts', 'last_error', 'next_attempt_at')
+    )
+    return len(sent_ids), len(failed)
@@ -0,0 +1,79 @@
+"""Пропускная способность создания отзывов и комментариев через API.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_review_create.py --requests 500
+"""
+import argparse
+import time
+
+from django_setup import setup_django
+
+
+def populate(titles_count):
+    from django.contrib.auth import get_user_model
+
+    from reviews.models import Category, Title
+
+    category = Category.objects.create(name='Фильм', slug='films')
+    Title.objects.bulk_create(
+        Title(name=f'Произведение {idx}', year=2000, category=category)
+        for idx in range(titles_count)
+    )
+    return get_user_model().objects.create_user(
+        username='bench', email='bench@yamdb.fake'
+    )
+
+
+def measure(client, urls, payload):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    queries = 0
+    started = time.perf_counter()
+    for url in urls:
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(url, data=payload, format='json')
+        assert response.status_code == 201, response.content
+        queries += len(context.captured_queries)
+    elapsed = time.perf_counter() - started
+    return len(urls) / elapsed, queries / len(urls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.test import APIClient
+
+    from reviews.models import Review, Title
+
+    user = populate(args.requests)
+    client = APIClient()
+    client.force_authenticate(user)
+    title_ids = list(Title.objects.values_list('id', flat=True))
+
+    reviews = measure(
+        client,
+        [f'/api/v1/titles/{title_id}/reviews/' for title_id in title_ids],
+        {'text': 'Отзыв', 'score': 7}
+    )
+    comments = measure(
+        client,
+        [
+            f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+            for title_id, review_id in Review.objects.values_list(
+                'title_id', 'id'
+            )
+        ],
+        {'text': 'Комментарий'}
+    )
+    for name, (rate, queries) in (('Отзывы', reviews),
+                                  ('Комментарии', comments)):
+        print(f'{name:<12} {rate:8.1f} запросов/с, '
+              f'{queries:.1f} SQL-запросов на POST')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Параллельные регистрации через локальный HTTP-сервер.
+
+Запускает многопоточный WSGI-сервер на файловой тестовой базе и
+отправляет на /api/v1/auth/signup/ поток запросов из нескольких потоков.
+Часть запросов повторяет регистрацию того же пользователя (ответ 200),
+часть — пытается занять username заранее созданного пользователя с
+другим email (ответ 400). Ошибками считаются ответы с другим статусом и
+сбои соединения.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_signup_concurrent.py --requests 5000 --workers 64
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django_setup import setup_django
+
+SIGNUP_URL = '/api/v1/auth/signup/'
+
+
+def start_server():
+    from django.core.servers.basehttp import (
+        ThreadedWSGIServer, get_internal_wsgi_application
+    )
+    from django.test.testcases import QuietWSGIRequestHandler
+
+    class Server(ThreadedWSGIServer):
+        request_queue_size = 1024
+
+    server = Server(('127.0.0.1', 0), QuietWSGIRequestHandler)
+    server.set_app(get_internal_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def populate(taken):
+    from users.models import User
+
+    User.objects.bulk_create(
+        User(username=f'taken{idx}', email=f'taken{idx}@yamdb.fake')
+        for idx in range(taken)
+    )
+
+
+def make_payloads(requests, users, taken, conflict_share, seed):
+    """Возвращает пары (данные запроса, ожидаемый статус)."""
+    rnd = random.Random(seed)
+    payloads = []
+    for idx in range(requests):
+        if taken and rnd.random() < conflict_share:
+            username = f'taken{rnd.randrange(taken)}'
+            payloads.append(
+                ({'username': username, 'email': f'other{idx}@yamdb.fake'},
+                 400)
+            )
+        else:
+            username = f'storm{rnd.randrange(users)}'
+            payloads.append(
+                ({'username': username, 'email': f'{username}@yamdb.fake'},
+                 200)
+            )
+    return payloads
+
+
+def post(base_url, payload):
+    request = Request(
+        base_url + SIGNUP_URL,
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json'}
+    )
+    started = time.perf_counter()
+    try:
+        with urlopen(request, timeout=30) as response:
+            status = response.status
+    except HTTPError as error:
+        status = error.code
+    except (URLError, OSError) as error:
+        status = type(error).__name__
+    return status, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--users', type=int, default=None,
+                        help='число разных username (по умолчанию 80%% '
+                             'от числа запросов)')
+    parser.add_argument('--taken', type=int, default=100,
+                        help='число заранее созданных пользователей')
+    parser.add_argument('--conflict-share', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp()
+    try:
+        setup_django(os.path.join(db_dir, 'bench.sqlite3'))
+        from django.conf import settings
+        from django.db import connection
+        from django.test.utils import override_settings
+
+        from users.models import User
+
+        # Все запросы идут с одного адреса: ограничение частоты отключено,
+        # чтобы замерять работу с базой.
+        override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}
+        }).enable()
+        populate(args.taken)
+        server = start_server()
+        # Ответы 400 и 500 подсчитываются ниже, журнал их не дублирует.
+        # Уровень задается после start_server: WSGI-приложение заново
+        # настраивает журналы при создании.
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        payloads = make_payloads(
+            args.requests, args.users or max(1, args.requests * 4 // 5),
+            args.taken, args.conflict_share, args.seed
+        )
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.workers) as executor:
+            results = list(executor.map(
+                lambda item: post(base_url, item[0]), payloads
+            ))
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+
+        statuses = Counter(status for status, _ in results)
+        errors = sum(
+            status != expected
+            for (_, expected), (status, _) in zip(payloads, results)
+        )
+        latencies = sorted(latency for _, latency in results)
+        print(f'Запросов: {len(results)}, потоков: {args.workers}, '
+              f'{len(results) / elapsed:.1f} запросов/с')
+        print('Статусы: ' + ', '.join(
+            f'{status}: {count}' for status, count in statuses.most_common()
+        ))
+        print(f'Ошибок: {errors} ({errors / len(results):.2%})')
+        print(f'Задержка p50 {statistics.median(latencies) * 1000:.1f} мс, '
+              f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс')
+        print(f'Пользователей в базе: {User.objects.count()}')
+        connection.close()
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Сравнение TitleReadSerializer и TitleValuesSerializer.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_title_serializer.py --titles 2000 --page 100
+"""
+import argparse
+import timeit
+
+from django_setup import setup_django
+
+
+def populate(titles_count, genres_count):
+    from reviews.models import Category, Genre, GenreTitle, Title
+
+    category = Category.objects.create(name='Фильм', slug='films')
+    Genre.objects.bulk_create(
+        Genre(name=f'Жанр {idx}', slug=f'genre-{idx}')
+        for idx in range(genres_count)
+    )
+    genres = list(Genre.objects.all())
+    Title.objects.bulk_create(
+        Title(
+            name=f'Произведение {idx}', year=1900 + idx % 120,
+            description='Описание ' * 10, category=category,
+            rating_sum=idx % 50, rating_count=idx % 7
+        )
+        for idx in range(titles_count)
+    )
+    GenreTitle.objects.bulk_create(
+        GenreTitle(title_id=title_id, genre=genres[(title_id + shift)
+                                                   % len(genres)])
+        for title_id in Title.objects.values_list('id', flat=True)
+        for shift in range(3)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=2000)
+    parser.add_argument('--genres', type=int, default=20)
+    parser.add_argument('--page', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+
+    from api.serializers import TitleReadSerializer, TitleValuesSerializer
+    from reviews.models import Title
+
+    populate(args.titles, args.genres)
+    queryset = Title.objects.select_related(
+        'category'
+    ).prefetch_related('genre')
+
+    def read_serializer():
+        return TitleReadSerializer(
+            queryset[:args.page], many=True
+        ).data
+
+    def values_serializer():
+        return TitleValuesSerializer(
+            TitleValuesSerializer.get_rows(queryset)[:args.page]
+        ).data
+
+    renderer = JSONRenderer()
+    assert (renderer.render(read_serializer())
+            == renderer.render(values_serializer()))
+
+    for name, func in (('TitleReadSerializer', read_serializer),
+                       ('TitleValuesSerializer', values_serializer)):
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f'{name:<24} {best * 1000:8.2f} мс на страницу '
+              f'из {args.page} произведений')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""Подготовка окружения для бенчмарков.
+
+Настраивает Django на проект api_yamdb и создает тестовую базу данных,
+чтобы замеры не затрагивали рабочую базу.
+"""
+import os
+import sys
+
+PROJECT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api_yamdb'
+)
+
+
+def setup_django(test_db_name=None):
+    """Настраивает Django и создает тестовую базу.
+
+    По умолчанию база SQLite создается в памяти. Если замер обращается к
+    базе из нескольких потоков, передайте путь к файлу в test_db_name.
+    """
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    if test_db_name is not None:
+        connection.settings_dict['TEST']['NAME'] = test_db_name
+    connection.creation.create_test_db(verbosity=0)
@@ -0,0 +1,19 @@
+import pytest
+from django.core.cache import cache
+
+from api.authentication import user_cache
+from api.fields import slug_cache
+from api.signup import signup_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    slug_cache.clear()
+    user_cache.clear()
+    signup_cache.clear()
+    yield
+    cache.clear()
+    slug_cache.clear()
+    user_cache.clear()
+    signup_cache.clear()
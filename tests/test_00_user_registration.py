@@ -1,8 +1,22 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
+from io import StringIO
 
 import pytest
 from django.core import mail
-from django.db.utils import IntegrityError
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.db.utils import IntegrityError, OperationalError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.throttling import AuthRateThrottle
+from users.models import OutboxEmail
+from users.outbox import get_outbox_depth, send_outbox_batch
 
 from tests.utils import (
     invalid_data_for_user_patch_and_creation,
@@ -10,6 +24,12 @@ from tests.utils import (
 )
 
 
+class FailingEmailBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP недоступен')
+
+
 @pytest.mark.django_db(transaction=True)
 class Test00UserRegistration:
     URL_SIGNUP = '/api/v1/auth/signup/'
@@ -112,6 +132,8 @@ class Test00UserRegistration:
         }
 
         response = client.post(self.URL_SIGNUP, data=valid_data)
+        # Письма отправляются из очереди отдельной командой.
+        call_command('send_outbox', '--once', stdout=StringIO())
         outbox_after = mail.outbox  # email outbox after user create
 
         assert response.status_code != HTTPStatus.NOT_FOUND, (
@@ -375,3 +397,157 @@ class Test00UserRegistration:
             'пользователя, созданного администратором,  возвращает ответ '
             'со статусом 200.'
         )
+
+    def test_signup_email_outbox_retry(self, client):
+        outbox_before_count = len(mail.outbox)
+        for idx in range(2):
+            client.post(self.URL_SIGNUP, data={
+                'email': f'queued{idx}@yamdb.fake',
+                'username': f'queued{idx}'
+            })
+        assert len(mail.outbox) == outbox_before_count, (
+            f'Проверьте, что POST-запрос к `{self.URL_SIGNUP}` только ставит '
+            'письмо в очередь и не отправляет его во время запроса.'
+        )
+        assert get_outbox_depth() == 2
+
+        assert send_outbox_batch(FailingEmailBackend()) == (0, 2)
+        assert get_outbox_depth() == 2 and all(
+            email.attempts == 1 and email.next_attempt_at > timezone.now()
+            for email in OutboxEmail.objects.all()
+        ), (
+            'Проверьте, что неотправленные письма остаются в очереди, '
+            'а повторная попытка откладывается.'
+        )
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        stdout = StringIO()
+        call_command('send_outbox', '--once', stdout=stdout)
+        assert len(mail.outbox) == outbox_before_count + 2, (
+            'Проверьте, что команда `send_outbox` повторно отправляет '
+            'письма после неудачной попытки.'
+        )
+        assert get_outbox_depth() == 0
+        assert 'в очереди: 0' in stdout.getvalue()
+
+    def test_signup_storm_conflicts(self, client, admin_client,
+                                    django_user_model,
+                                    django_assert_num_queries):
+        valid_data = {
+            'email': 'storm@yamdb.fake',
+            'username': 'storm_user'
+        }
+        for _ in range(2):
+            response = client.post(self.URL_SIGNUP, data=valid_data)
+            assert response.status_code == HTTPStatus.OK
+        assert django_user_model.objects.filter(
+            username='storm_user'
+        ).count() == 1, (
+            f'Проверьте, что повторный POST-запрос к `{self.URL_SIGNUP}` не '
+            'создает второго пользователя.'
+        )
+
+        conflict_data = {
+            'email': 'storm_other@yamdb.fake',
+            'username': 'storm_user'
+        }
+        # Два запроса — к счетчикам ограничения частоты.
+        with django_assert_num_queries(2):
+            response = client.post(self.URL_SIGNUP, data=conflict_data)
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что регистрация с занятым `username` отклоняется '
+            'без запросов к пользователям, если пользователь уже известен.'
+        )
+
+        response = admin_client.patch(
+            f'{self.URL_ADMIN_CREATE_USER}storm_user/',
+            data={'email': 'storm_new@yamdb.fake'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        response = client.post(self.URL_SIGNUP, data={
+            'email': 'storm@yamdb.fake',
+            'username': 'storm_user_2'
+        })
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что освободившийся после изменения пользователя '
+            '`email` снова можно использовать при регистрации.'
+        )
+
+    def test_auth_endpoints_throttled(self, client, settings,
+                                      django_assert_num_queries):
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {
+                'auth_ip': '5/min', 'auth_username': '2/min'
+            }
+        }
+        data = {'username': 'brute_user', 'confirmation_code': '12345'}
+        for _ in range(2):
+            response = client.post(self.URL_TOKEN, data=data)
+            assert response.status_code != HTTPStatus.TOO_MANY_REQUESTS
+        # Два запроса — к счетчикам по IP-адресу и по username.
+        with django_assert_num_queries(2):
+            response = client.post(self.URL_TOKEN, data=data)
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS, (
+            f'Проверьте, что POST-запросы к `{self.URL_TOKEN}` с одним '
+            '`username` сверх лимита отклоняются со статусом 429 до '
+            'проверки кода подтверждения и поиска пользователя.'
+        )
+        assert 'Retry-After' in response
+
+        # Отклоненный запрос тоже учтен: с этого адреса прошло 3 из 5.
+        for idx in range(2):
+            response = client.post(
+                self.URL_SIGNUP,
+                data={
+                    'email': f'brute{idx}@yamdb.fake',
+                    'username': f'brute{idx}'
+                },
+                HTTP_X_FORWARDED_FOR=f'10.0.0.{idx}'
+            )
+            assert response.status_code == HTTPStatus.OK
+        response = client.post(
+            self.URL_SIGNUP,
+            data={'email': 'brute@yamdb.fake', 'username': 'brute'},
+            HTTP_X_FORWARDED_FOR='10.0.0.100'
+        )
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS, (
+            f'Проверьте, что POST-запросы к `{self.URL_SIGNUP}` с одного '
+            'IP-адреса сверх лимита отклоняются со статусом 429, даже если '
+            'клиент меняет заголовок `X-Forwarded-For`.'
+        )
+
+    def test_auth_throttle_parallel_requests(self, settings):
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {
+                'auth_ip': None, 'auth_username': '5/min'
+            }
+        }
+        request = Request(
+            APIRequestFactory().post(
+                self.URL_TOKEN, {'username': 'brute_user'}, format='json'
+            ),
+            parsers=[JSONParser()]
+        )
+        # Тело разбирается до запуска потоков, чтобы они не читали поток
+        # запроса одновременно.
+        assert request.data == {'username': 'brute_user'}
+
+        def allow(_):
+            # Тестовая база в памяти открыта в режиме общего кеша SQLite:
+            # при параллельной записи он сразу возвращает «database table
+            # is locked», не дожидаясь блокировки, как файловая база.
+            while True:
+                try:
+                    return AuthRateThrottle().allow_request(request, None)
+                except OperationalError:
+                    time.sleep(0.001)
+                finally:
+                    connection.close()
+
+        with ThreadPoolExecutor(20) as executor:
+            allowed = list(executor.map(allow, range(50)))
+        assert sum(allowed) == 5, (
+            'Проверьте, что параллельные запросы не проходят сверх лимита.'
+        )
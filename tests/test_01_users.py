@@ -1,7 +1,17 @@
+import time
 from http import HTTPStatus
+from types import SimpleNamespace
 
 import pytest
-
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.cache.backends import locmem
+from django.db.models import F
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import ROLE_VERSION_TIMEOUT, user_cache
+from api.cache import user_role_version_key
 from tests.utils import (
     check_pagination, invalid_data_for_user_patch_and_creation
 )
@@ -564,3 +574,134 @@ class Test01UserAPI:
             f'Проверьте, что PATCH-запрос к `{self.USERS_ME_URL}` с ключом '
             '`role` не изменяет роль пользователя.'
         )
+
+    def test_11_cached_token_user(self, admin_client, user_client, user,
+                                  django_assert_num_queries):
+        categories_url = '/api/v1/categories/'
+        data = {'name': 'Фильм', 'slug': 'films'}
+        user_client.post(categories_url, data=data)
+
+        with django_assert_num_queries(0):
+            response = user_client.post(categories_url, data=data)
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            'Проверьте, что проверка прав по уже использованному токену '
+            'не обращается к базе данных.'
+        )
+
+        response = admin_client.patch(
+            f'{self.USERS_URL}{user.username}/', data={'role': 'admin'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        response = user_client.post(categories_url, data=data)
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что изменение роли пользователя сбрасывает его '
+            'из кеша аутентификации.'
+        )
+
+    def test_12_role_claims_in_token(self, client, admin_client, user,
+                                     django_assert_num_queries):
+        response = client.post('/api/v1/auth/token/', data={
+            'username': user.username,
+            'confirmation_code': default_token_generator.make_token(user)
+        })
+        token = response.json()['token']
+        assert AccessToken(token)['role'] == 'user', (
+            'Проверьте, что токен доступа содержит роль пользователя.'
+        )
+        user_client = APIClient()
+        user_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        categories_url = '/api/v1/categories/'
+        data = {'name': 'Фильм', 'slug': 'films'}
+        user_client.post(categories_url, data=data)
+
+        user_cache.clear()
+        with django_assert_num_queries(0):
+            response = user_client.post(categories_url, data=data)
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            'Проверьте, что права пользователя проверяются по роли из '
+            'токена без обращения к базе данных.'
+        )
+
+        admin_client.patch(
+            f'{self.USERS_URL}{user.username}/', data={'role': 'admin'}
+        )
+        response = user_client.post(categories_url, data=data)
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что после изменения роли пользователя выданные '
+            'ранее токены перестают приниматься.'
+        )
+        user.refresh_from_db()
+        response = client.post('/api/v1/auth/token/', data={
+            'username': user.username,
+            'confirmation_code': default_token_generator.make_token(user)
+        })
+        user_client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {response.json()["token"]}'
+        )
+        response = user_client.post(categories_url, data=data)
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что новый токен содержит новую роль пользователя.'
+        )
+
+    def test_13_role_version_expires_in_other_workers(
+            self, client, user, django_user_model, monkeypatch):
+        response = client.post('/api/v1/auth/token/', data={
+            'username': user.username,
+            'confirmation_code': default_token_generator.make_token(user)
+        })
+        user_client = APIClient()
+        user_client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {response.json()["token"]}'
+        )
+        assert user_client.get(self.USERS_ME_URL).status_code == HTTPStatus.OK
+
+        # Роль меняет другой процесс: сигнал не обновляет локальный кеш
+        # этого процесса, и в нем остается прежняя версия прав.
+        django_user_model.objects.filter(pk=user.pk).update(
+            role='admin', role_version=F('role_version') + 1
+        )
+        now = time.time()
+        monkeypatch.setattr(locmem, 'time', SimpleNamespace(
+            time=lambda: now + ROLE_VERSION_TIMEOUT + 1
+        ))
+        response = user_client.get(self.USERS_ME_URL)
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что версия прав пользователя хранится в кеше '
+            'ограниченное время и токены с прежней ролью перестают '
+            'приниматься и в других процессах.'
+        )
+
+    def test_14_me_patch_ignores_stale_cached_user(
+            self, client, user, django_user_model):
+        def get_token():
+            user.refresh_from_db()
+            response = client.post('/api/v1/auth/token/', data={
+                'username': user.username,
+                'confirmation_code': default_token_generator.make_token(user)
+            })
+            return response.json()['token']
+
+        django_user_model.objects.filter(pk=user.pk).update(role='admin')
+        user_client = APIClient()
+        user_client.credentials(HTTP_AUTHORIZATION=f'Bearer {get_token()}')
+        assert user_client.get(self.USERS_ME_URL).status_code == HTTPStatus.OK
+
+        # Администратора понижает другой процесс: в кеше этого процесса
+        # остается копия пользователя с прежней ролью.
+        django_user_model.objects.filter(pk=user.pk).update(
+            role='user', role_version=F('role_version') + 1
+        )
+        cache.delete(user_role_version_key(user.pk))
+        user_client.credentials(HTTP_AUTHORIZATION=f'Bearer {get_token()}')
+        response = user_client.patch(
+            self.USERS_ME_URL, data={'bio': 'new user bio'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        user.refresh_from_db()
+        assert (user.role, user.role_version, user.bio) == (
+            'user', 1, 'new user bio'
+        ), (
+            'Проверьте, что изменение собственной страницы сохраняет '
+            'актуальную запись пользователя из базы, а не копию из кеша '
+            'аутентификации.'
+        )
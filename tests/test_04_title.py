@@ -1,10 +1,16 @@
 from http import HTTPStatus
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
 
+from api.fields import slug_cache
+from api.serializers import TitleReadSerializer, TitleValuesSerializer
+from reviews.models import Category, Genre, Title
 from tests.utils import (
     check_pagination, check_permissions, create_categories, create_genre,
-    create_titles
+    create_single_review, create_titles
 )
 
 
@@ -353,3 +359,394 @@ class Test04TitleAPI:
             f'Проверьте, что PUT-запрос к `{self.TITLES_DETAIL_URL_TEMPLATE} '
             'не предусмотрен и возвращает статус 405.'
         )
+
+    def test_07_titles_query_count(self, client, admin_client,
+                                   django_assert_num_queries):
+        titles, categories, genres = create_titles(admin_client)
+        category = Category.objects.get(slug=categories[0]['slug'])
+        genre_objs = list(Genre.objects.all())
+        for idx in range(10):
+            title = Title.objects.create(
+                name=f'Произведение {idx}', year=2000, category=category
+            )
+            title.genre.set(genre_objs)
+
+        # COUNT для пагинации, выборка произведений с категориями
+        # и одна выборка жанров для всей страницы.
+        for limit in (2, 12):
+            with django_assert_num_queries(3):
+                response = client.get(f'{self.TITLES_URL}?limit={limit}')
+            assert len(response.json()['results']) == limit, (
+                f'Проверьте, что для эндпоинта `{self.TITLES_URL}` '
+                'настроена пагинация.'
+            )
+
+        with django_assert_num_queries(2):
+            response = client.get(
+                self.TITLES_DETAIL_URL_TEMPLATE.format(
+                    title_id=titles[0]['id']
+                )
+            )
+        assert len(response.json()['genre']) == len(titles[0]['genre']), (
+            f'Проверьте, что ответ на GET-запрос к '
+            f'`{self.TITLES_DETAIL_URL_TEMPLATE}` содержит жанры '
+            'произведения.'
+        )
+
+    def test_08_titles_keyset_pagination(self, client, admin_client,
+                                         django_assert_num_queries):
+        create_titles(admin_client)
+        for idx in range(7):
+            Title.objects.create(name=f'Дубль {idx % 2}', year=1990)
+        expected_ids = list(
+            Title.objects.order_by('-year', 'name', 'id').values_list(
+                'id', flat=True
+            )
+        )
+
+        url = f'{self.TITLES_URL}?cursor=&limit=2'
+        received_ids = []
+        while url:
+            # Без COUNT: выборка страницы и жанров для нее.
+            with django_assert_num_queries(2):
+                response = client.get(url)
+            assert response.status_code == HTTPStatus.OK, (
+                f'Проверьте, что GET-запрос к `{self.TITLES_URL}` с '
+                'параметром `cursor` возвращает ответ со статусом 200.'
+            )
+            data = response.json()
+            assert set(data) == {'next', 'results'}, (
+                f'Проверьте, что ответ `{self.TITLES_URL}` в режиме курсора '
+                'содержит ключи `next` и `results`.'
+            )
+            received_ids.extend(title['id'] for title in data['results'])
+            url = data['next']
+
+        assert received_ids == expected_ids, (
+            f'Проверьте, что постраничный обход `{self.TITLES_URL}` по '
+            'курсору возвращает все произведения по одному разу в порядке '
+            'сортировки.'
+        )
+
+        response = client.get(f'{self.TITLES_URL}?cursor=broken')
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что некорректный курсор возвращает ответ со '
+            'статусом 404.'
+        )
+
+        Title.objects.bulk_create(
+            Title(name=f'Пакет {idx}', year=2000) for idx in range(150)
+        )
+        response = client.get(f'{self.TITLES_URL}?limit=150')
+        assert len(response.json()['results']) == 150, (
+            'Проверьте, что без параметра `cursor` размер страницы '
+            'не ограничивается.'
+        )
+        response = client.get(f'{self.TITLES_URL}?cursor=&limit=150')
+        assert len(response.json()['results']) == 100, (
+            'Проверьте, что в режиме курсора размер страницы не больше 100.'
+        )
+
+    @pytest.mark.parametrize('backend', (
+        'django.core.cache.backends.locmem.LocMemCache',
+        'django.core.cache.backends.filebased.FileBasedCache',
+    ))
+    def test_09_titles_list_cache(self, backend, client, admin_client,
+                                  settings, tmp_path,
+                                  django_assert_num_queries):
+        settings.CACHES = {
+            'default': {'BACKEND': backend, 'LOCATION': str(tmp_path)}
+        }
+        titles, categories, genres = create_titles(admin_client)
+        url = f'{self.TITLES_URL}?genre={genres[0]["slug"]}&limit=5'
+
+        first = client.get(url).json()
+        with django_assert_num_queries(0):
+            response = client.get(
+                f'{self.TITLES_URL}?limit=5&genre={genres[0]["slug"]}'
+            )
+        assert response.json() == first, (
+            f'Проверьте, что повторный GET-запрос к `{self.TITLES_URL}` с '
+            'теми же параметрами возвращается из кеша.'
+        )
+
+        admin_client.patch(
+            self.TITLES_DETAIL_URL_TEMPLATE.format(title_id=titles[0]['id']),
+            data={'name': 'Новое название'}
+        )
+        data = client.get(url).json()
+        assert data['results'][0]['name'] == 'Новое название', (
+            'Проверьте, что изменение произведения сбрасывает кеш списка '
+            'произведений.'
+        )
+
+        Genre.objects.filter(slug=genres[0]['slug']).update(name='Хоррор')
+        Genre.objects.get(slug=genres[0]['slug']).save()
+        data = client.get(url).json()
+        assert {'name': 'Хоррор', 'slug': genres[0]['slug']} in (
+            data['results'][0]['genre']
+        ), (
+            'Проверьте, что изменение жанра сбрасывает кеш списка '
+            'произведений.'
+        )
+
+    def test_10_titles_full_text_search(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        Title.objects.create(
+            name='Ёлки', year=2010,
+            description='Новогодняя комедия, не терминатор.'
+        )
+
+        response = client.get(f'{self.TITLES_URL}?search=терминатор')
+        names = [title['name'] for title in response.json()['results']]
+        assert names == ['Терминатор', 'Ёлки'], (
+            f'Проверьте, что параметр `search` эндпоинта `{self.TITLES_URL}` '
+            'ищет по названию и описанию без учета регистра и ставит '
+            'совпадения в названии выше.'
+        )
+
+        response = client.get(f'{self.TITLES_URL}?search=елки')
+        assert [title['name'] for title in response.json()['results']] == [
+            'Ёлки'
+        ], 'Проверьте, что поиск не различает буквы «е» и «ё».'
+
+        admin_client.patch(
+            self.TITLES_DETAIL_URL_TEMPLATE.format(title_id=titles[1]['id']),
+            data={'name': 'Крепкий орешек 2'}
+        )
+        response = client.get(f'{self.TITLES_URL}?search=креп орешек')
+        assert response.json()['count'] == 1, (
+            'Проверьте, что поисковый индекс обновляется при изменении '
+            'произведения и поддерживает поиск по началу слов.'
+        )
+
+        admin_client.delete(
+            self.TITLES_DETAIL_URL_TEMPLATE.format(title_id=titles[1]['id'])
+        )
+        response = client.get(f'{self.TITLES_URL}?search=орешек')
+        assert response.json()['count'] == 0, (
+            'Проверьте, что удаленное произведение пропадает из поиска.'
+        )
+
+    def test_11_titles_slug_filters(self, client, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+        horror, comedy, drama = (genre['slug'] for genre in genres)
+
+        def get_names(query):
+            response = client.get(f'{self.TITLES_URL}?{query}')
+            return sorted(title['name'] for title in response.json()['results'])
+
+        assert get_names(f'genre={horror},{comedy}') == ['Терминатор'], (
+            'Проверьте, что фильтр по нескольким жанрам не дублирует '
+            'произведения.'
+        )
+        assert get_names(f'genre={horror},{drama}') == [
+            'Крепкий орешек', 'Терминатор'
+        ], 'Проверьте, что по умолчанию достаточно любого из жанров.'
+        assert get_names(f'genre={horror},{drama}&genre_match=all') == [], (
+            'Проверьте, что `genre_match=all` требует наличия всех жанров.'
+        )
+        assert get_names(
+            f'genre={horror},{comedy}&genre_match=all'
+        ) == ['Терминатор']
+        assert get_names('genre=hor') == [], (
+            'Проверьте, что жанр сравнивается по слагу точно.'
+        )
+        assert get_names(
+            f'category={categories[0]["slug"]},{categories[1]["slug"]}'
+        ) == ['Крепкий орешек', 'Терминатор'], (
+            'Проверьте, что можно фильтровать по нескольким категориям.'
+        )
+
+    def test_12_titles_values_serializer_output(self, admin_client,
+                                                user_client):
+        titles, _, _ = create_titles(admin_client)
+        Title.objects.create(name='Без категории и жанров', year=2001)
+        create_single_review(user_client, titles[0]['id'], 'Отзыв', 7)
+        queryset = Title.objects.select_related(
+            'category'
+        ).prefetch_related('genre')
+
+        expected = JSONRenderer().render(
+            TitleReadSerializer(queryset, many=True).data
+        )
+        received = JSONRenderer().render(
+            TitleValuesSerializer(TitleValuesSerializer.get_rows(queryset)).data
+        )
+        assert received == expected, (
+            'Проверьте, что `TitleValuesSerializer` возвращает те же данные, '
+            'что и `TitleReadSerializer`.'
+        )
+
+    def test_13_titles_bulk_create(self, admin_client, user_client,
+                                   django_assert_num_queries):
+        url = f'{self.TITLES_URL}bulk/'
+        genres = create_genre(admin_client)
+        categories = create_categories(admin_client)
+        items = [
+            {
+                'name': f'Произведение {idx}',
+                'year': 1990 + idx,
+                'genre': [genres[0]['slug'], genres[idx % 3]['slug']],
+                'category': categories[idx % 2]['slug'],
+            }
+            for idx in range(30)
+        ]
+
+        response = user_client.post(url, data=items, format='json')
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            f'Проверьте, что `{url}` доступен только администратору.'
+        )
+
+        invalid_items = [
+            items[0],
+            {**items[1], 'genre': ['unknown']},
+            {**items[2], 'year': 3000},
+        ]
+        response = admin_client.post(url, data=invalid_items, format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        errors = response.json()
+        assert len(errors) == 3 and errors[0] == {} and 'year' in errors[2], (
+            f'Проверьте, что `{url}` возвращает ошибки по каждому элементу.'
+        )
+        assert not Title.objects.exists()
+
+        # Слаги категорий и жанров, BEGIN, вставка произведений, их
+        # идентификаторы, вставка жанров и две выборки для ответа —
+        # независимо от количества элементов. Пользователь уже в кеше
+        # аутентификации после предыдущего запроса.
+        with django_assert_num_queries(8):
+            response = admin_client.post(url, data=items, format='json')
+        assert response.status_code == HTTPStatus.CREATED, (
+            f'Проверьте, что POST-запрос администратора к `{url}` с '
+            'корректными данными возвращает ответ со статусом 201.'
+        )
+        data = response.json()
+        assert [title['name'] for title in data] == [
+            item['name'] for item in items
+        ]
+        title = Title.objects.get(pk=data[1]['id'])
+        assert title.name == items[1]['name'] and set(
+            title.genre.values_list('slug', flat=True)
+        ) == set(items[1]['genre']), (
+            f'Проверьте, что `{url}` создает произведения с их жанрами.'
+        )
+
+    def test_14_titles_create_slug_queries(self, admin_client):
+        genres = create_genre(admin_client)
+        categories = create_categories(admin_client)
+        data = {
+            'name': 'Мост через реку Квай',
+            'year': 1957,
+            'genre': [genre['slug'] for genre in genres],
+            'category': categories[0]['slug'],
+        }
+
+        with CaptureQueriesContext(connection) as cold:
+            admin_client.post(self.TITLES_URL, data=data)
+        slug_queries = [
+            query['sql'] for query in cold.captured_queries
+            if 'WHERE "reviews_genre"."slug"' in query['sql']
+        ]
+        assert len(slug_queries) == 1 and ' IN (' in slug_queries[0], (
+            'Проверьте, что все жанры из запроса на создание произведения '
+            'проверяются одним запросом.'
+        )
+
+        with CaptureQueriesContext(connection) as warm:
+            response = admin_client.post(self.TITLES_URL, data=data)
+        assert response.status_code == HTTPStatus.CREATED
+        assert not any(
+            'WHERE "reviews_genre"."slug"' in query['sql']
+            or 'WHERE "reviews_category"."slug"' in query['sql']
+            for query in warm.captured_queries
+        ), (
+            'Проверьте, что повторное создание произведения не проверяет '
+            'слаги жанров и категории в базе: они берутся из кеша.'
+        )
+        assert response.json()['genre'] == sorted(
+            genres, key=lambda genre: genre['name']
+        )
+
+        # Жанр удален в другом процессе, а его слаг остался в кеше.
+        genre = Genre.objects.get(slug=genres[0]['slug'])
+        genre.delete()
+        slug_cache.set(('reviews.Genre', 'slug', genre.slug), genre.pk)
+        response = admin_client.post(self.TITLES_URL, data=data)
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что ссылка на удаленный жанр из устаревшего кеша '
+            'возвращает ответ со статусом 400.'
+        )
+
+    def test_15_titles_summary(self, client, admin_client, user_client,
+                               django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        create_single_review(admin_client, title_id, 'Отзыв', 4)
+        detail_url = self.TITLES_DETAIL_URL_TEMPLATE.format(title_id=title_id)
+        url = detail_url + 'summary/'
+
+        # Произведение с числом отзывов, жанры и последние отзывы.
+        with django_assert_num_queries(3):
+            response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что GET-запрос к `{self.TITLES_DETAIL_URL_TEMPLATE}'
+            'summary/` возвращает ответ со статусом 200.'
+        )
+        data = response.json()
+        reviews = data.pop('reviews')
+        assert data.pop('reviews_count') == 1 and len(reviews) == 1, (
+            'Проверьте, что сводка содержит число отзывов и последние '
+            'отзывы произведения.'
+        )
+        assert reviews[0]['comments_count'] == 0
+        assert data == client.get(detail_url).json(), (
+            'Проверьте, что сводка содержит те же поля произведения, что и '
+            f'ответ на GET-запрос к `{self.TITLES_DETAIL_URL_TEMPLATE}`.'
+        )
+
+        etag = response.get('ETag')
+        with django_assert_num_queries(0):
+            assert client.get(url).status_code == HTTPStatus.OK
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Проверьте, что повторная сводка отдается из кеша, а при '
+            'совпадении `ETag` возвращается ответ со статусом 304.'
+        )
+
+        create_single_review(user_client, title_id, 'Второй', 8)
+        data = client.get(url, HTTP_IF_NONE_MATCH=etag).json()
+        assert (data['reviews_count'], data['rating']) == (2, 6), (
+            'Проверьте, что новый отзыв меняет версию сводки произведения.'
+        )
+        assert [review['text'] for review in data['reviews']] == [
+            'Второй', 'Отзыв'
+        ]
+        response = client.get(
+            self.TITLES_DETAIL_URL_TEMPLATE.format(title_id=0) + 'summary/'
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_16_titles_search_with_cursor(self, client, admin_client):
+        create_titles(admin_client)
+        Title.objects.create(
+            name='Ёлки', year=2010,
+            description='Новогодняя комедия, не терминатор.'
+        )
+        names = []
+        response = client.get(
+            self.TITLES_URL, {'search': 'терминатор', 'cursor': '', 'limit': 1}
+        )
+        while True:
+            assert response.status_code == HTTPStatus.OK, (
+                'Проверьте, что параметр `cursor` совместим с поиском.'
+            )
+            data = response.json()
+            names.extend(title['name'] for title in data['results'])
+            if not data['next']:
+                break
+            response = client.get(data['next'])
+        assert names == ['Терминатор', 'Ёлки'], (
+            'Проверьте, что постраничный обход результатов поиска сохраняет '
+            'сортировку по релевантности.'
+        )
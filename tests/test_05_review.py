@@ -1,17 +1,27 @@
+import json
+import time
 from http import HTTPStatus
+from io import StringIO
+from types import SimpleNamespace
 
 import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache.backends import locmem
+from django.core.management import call_command
 from django.db.utils import IntegrityError
 
+from reviews.models import RatingMark, Review, Title, TitleScoreCount
 from tests.utils import (
-    check_fields, check_pagination, create_reviews, create_single_review,
-    create_titles
+    check_fields, check_pagination, check_query_plans_without_sorting,
+    create_comments, create_reviews, create_single_comment,
+    create_single_review, create_titles
 )
 
 
 @pytest.mark.django_db(transaction=True)
 class Test05ReviewAPI:
 
+    TITLES_URL = '/api/v1/titles/'
     TITLE_DETAIL_URL_TEMPLATE = '/api/v1/titles/{title_id}/'
     REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
     REVIEW_DETAIL_URL_TEMPLATE = (
@@ -413,3 +423,460 @@ class Test05ReviewAPI:
             f'Проверьте, что PUT-запрос к `{self.REVIEW_DETAIL_URL_TEMPLATE} '
             'не предусмотрен и возвращает статус 405.'
         )
+
+    def test_07_rating_follows_review_changes(
+            self, admin_client, admin, user_client, user, moderator_client,
+            moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        title_url = self.TITLE_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id']
+        )
+        assert admin_client.get(title_url).json().get('rating') == 5, (
+            'Проверьте, что рейтинг произведения равен средней оценке '
+            'его отзывов.'
+        )
+
+        user_client.patch(
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id=reviews[1]['id']
+            ),
+            data={'score': 10}
+        )
+        assert admin_client.get(title_url).json().get('rating') == 6, (
+            'Проверьте, что изменение оценки отзыва пересчитывает рейтинг '
+            'произведения.'
+        )
+
+        for review in reviews:
+            admin_client.delete(
+                self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                    title_id=titles[0]['id'], review_id=review['id']
+                )
+            )
+        assert admin_client.get(title_url).json().get('rating') is None, (
+            'Проверьте, что после удаления всех отзывов рейтинг '
+            'произведения равен `None`.'
+        )
+
+    def test_08_rebuild_ratings_command(self, admin_client, admin,
+                                        user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        Title.objects.update(rating_sum=0, rating_count=0)
+
+        call_command('rebuild_ratings', stdout=StringIO())
+
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.rating_sum, title.rating_count) == (10, 2), (
+            'Проверьте, что команда `rebuild_ratings` пересчитывает сумму '
+            'и количество оценок произведений.'
+        )
+
+    def test_09_reviews_keyset_pagination(
+            self, client, admin_client, admin, user_client, user,
+            moderator_client, moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        url = (
+            self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+            + '?cursor=&limit=1'
+        )
+        received_ids = []
+        while url:
+            data = client.get(url).json()
+            received_ids.extend(review['id'] for review in data['results'])
+            url = data['next']
+        assert received_ids == [review['id'] for review in reversed(reviews)], (
+            'Проверьте, что постраничный обход отзывов по курсору '
+            'возвращает все отзывы от новых к старым.'
+        )
+
+    def test_10_reviews_conditional_get(
+            self, client, admin_client, admin, user_client, user,
+            django_assert_num_queries):
+        _, titles = create_reviews(admin_client, {admin: admin_client})
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        response = client.get(url)
+        etag = response.get('ETag')
+        last_modified = response.get('Last-Modified')
+        assert etag and last_modified, (
+            f'Проверьте, что ответ на GET-запрос к `{self.REVIEWS_URL_TEMPLATE}`'
+            ' содержит заголовки `ETag` и `Last-Modified`.'
+        )
+
+        with django_assert_num_queries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Проверьте, что при совпадении `If-None-Match` с текущим `ETag` '
+            'возвращается ответ со статусом 304 без обращения к базе.'
+        )
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Проверьте, что запрос с `If-Modified-Since` без изменений '
+            'возвращает ответ со статусом 304.'
+        )
+
+        create_single_review(user_client, titles[0]['id'], 'Новый', 7)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что после добавления отзыва запрос с прежним `ETag` '
+            'возвращает актуальный список отзывов.'
+        )
+        assert response.get('ETag') != etag
+
+    def test_11_review_post_query_budget(
+            self, admin_client, user_client, user, django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        data = {'text': 'Отзыв', 'score': 7}
+        admin_client.post(url, data=data)
+
+        # Пользователь, произведение, BEGIN, INSERT отзыва, UPDATE рейтинга,
+        # UPDATE счетчика оценки и INSERT в журнал изменений.
+        with django_assert_num_queries(7):
+            response = user_client.post(url, data=data)
+        assert response.status_code == HTTPStatus.CREATED, (
+            f'Проверьте, что POST-запрос к `{self.REVIEWS_URL_TEMPLATE}` '
+            'создает отзыв.'
+        )
+
+        response = user_client.post(url, data=data)
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что повторный отзыв того же автора на то же '
+            'произведение возвращает ответ со статусом 400.'
+        )
+        assert 'non_field_errors' in response.json(), (
+            'Проверьте, что ошибка повторного отзыва возвращается в поле '
+            '`non_field_errors`.'
+        )
+        assert Title.objects.get(pk=titles[0]['id']).rating_count == 2, (
+            'Проверьте, что отклоненный повторный отзыв не меняет рейтинг '
+            'произведения.'
+        )
+
+    def test_12_reviews_list_query_count(
+            self, client, admin_client, django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        get_user_model().objects.bulk_create(
+            get_user_model()(username=f'author{idx}',
+                             email=f'author{idx}@yamdb.fake')
+            for idx in range(100)
+        )
+        Review.objects.bulk_create(
+            Review(title_id=titles[0]['id'], author=author,
+                   text='Отзыв', score=5)
+            for author in get_user_model().objects.filter(
+                username__startswith='author'
+            )
+        )
+        url = (
+            self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+            + '?limit=100'
+        )
+
+        # Произведение, COUNT и страница отзывов вместе с авторами.
+        with django_assert_num_queries(3):
+            response = client.get(url)
+        results = response.json()['results']
+        assert len(results) == 100 and all(
+            review['author'].startswith('author') for review in results
+        ), (
+            'Проверьте, что страница отзывов загружает авторов тем же '
+            'запросом, что и отзывы.'
+        )
+
+    def test_13_reviews_comments_count(
+            self, client, admin_client, admin, user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        _, reviews, titles = create_comments(admin_client, author_map)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        response = client.get(url)
+        counts = {
+            review['id']: review.get('comments_count')
+            for review in response.json()['results']
+        }
+        assert counts == {reviews[0]['id']: 2, reviews[1]['id']: 0}, (
+            f'Проверьте, что отзывы в ответе на GET-запрос к '
+            f'`{self.REVIEWS_URL_TEMPLATE}` содержат количество '
+            'комментариев в поле `comments_count`.'
+        )
+
+        etag = response.get('ETag')
+        create_single_comment(
+            user_client, titles[0]['id'], reviews[1]['id'], 'Новый'
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что новый комментарий меняет `ETag` списка отзывов.'
+        )
+        detail = client.get(self.REVIEW_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[1]['id']
+        ))
+        assert detail.json().get('comments_count') == 1, (
+            'Проверьте, что `comments_count` учитывает новый комментарий.'
+        )
+
+    def test_14_score_histogram(self, client, admin_client, admin,
+                                user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        reviews, titles = create_reviews(admin_client, author_map)
+        url = self.TITLE_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id']
+        ) + 'score-histogram/'
+
+        def histogram():
+            response = client.get(url)
+            assert response.status_code == HTTPStatus.OK, (
+                'Проверьте, что GET-запрос к '
+                '`/api/v1/titles/{title_id}/score-histogram/` доступен '
+                'без авторизации.'
+            )
+            return {
+                item['score']: item['count'] for item in response.json()
+                if item['count']
+            }
+
+        assert histogram() == {5: 2}, (
+            'Проверьте, что гистограмма содержит количество отзывов '
+            'с каждой оценкой.'
+        )
+        admin_client.patch(
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id=reviews[0]['id']
+            ),
+            data={'score': 9}
+        )
+        assert histogram() == {5: 1, 9: 1}, (
+            'Проверьте, что изменение оценки отзыва переносит его '
+            'в другой столбец гистограммы.'
+        )
+        admin_client.delete(
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id=reviews[1]['id']
+            )
+        )
+        assert histogram() == {9: 1}, (
+            'Проверьте, что удаленный отзыв исключается из гистограммы.'
+        )
+
+        TitleScoreCount.objects.all().delete()
+        call_command('rebuild_score_histograms', stdout=StringIO())
+        assert histogram() == {9: 1}, (
+            'Проверьте, что команда `rebuild_score_histograms` '
+            'восстанавливает гистограммы по отзывам.'
+        )
+        response = client.get(self.TITLE_DETAIL_URL_TEMPLATE.format(
+            title_id=0
+        ) + 'score-histogram/')
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        response = client.get(self.TITLE_DETAIL_URL_TEMPLATE.format(
+            title_id='abc'
+        ) + 'score-histogram/')
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что гистограмма для некорректного id произведения '
+            'возвращает ответ со статусом 404.'
+        )
+
+    def test_15_reviews_include_comments(
+            self, client, admin_client, admin, user_client, user,
+            django_assert_num_queries):
+        author_map = {admin: admin_client, user: user_client}
+        _, reviews, titles = create_comments(admin_client, author_map)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        comments = client.get(
+            url + f'{reviews[0]["id"]}/comments/'
+        ).json()['results']
+
+        # Произведение, COUNT, страница отзывов и все комментарии к ней.
+        with django_assert_num_queries(4):
+            response = client.get(url + '?include=comments&comments_limit=1')
+        results = {
+            review['id']: review.get('comments')
+            for review in response.json()['results']
+        }
+        assert results == {
+            reviews[0]['id']: comments[:1], reviews[1]['id']: []
+        }, (
+            'Проверьте, что с параметром `include=comments` каждый отзыв '
+            'содержит `comments_limit` самых новых комментариев в том же '
+            'виде, что и в списке комментариев.'
+        )
+        assert 'comments' not in client.get(url).json()['results'][0], (
+            'Проверьте, что без параметра `include=comments` комментарии '
+            'в отзывы не добавляются.'
+        )
+        response = client.get(url + '?include=comments&comments_limit=0')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что некорректный `comments_limit` возвращает ответ '
+            'со статусом 400.'
+        )
+
+    def test_16_reviews_list_uses_index_order(self, client, admin_client,
+                                              admin, user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        check_query_plans_without_sorting(client, url)
+        check_query_plans_without_sorting(client, url + '?cursor=')
+
+    def test_17_deferred_rating_worker(self, client, admin_client, admin,
+                                       user_client, user, moderator_client,
+                                       settings):
+        settings.RATING_UPDATE_MODE = 'deferred'
+        author_map = {admin: admin_client, user: user_client}
+        reviews, titles = create_reviews(admin_client, author_map)
+        title_url = self.TITLE_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id']
+        )
+        assert client.get(title_url).json().get('rating') is None, (
+            'Проверьте, что в режиме `deferred` отзыв не пересчитывает '
+            'рейтинг произведения сразу.'
+        )
+        assert set(RatingMark.objects.values_list(
+            'title_id', flat=True
+        )) == {titles[0]['id']}, (
+            'Проверьте, что в режиме `deferred` отзыв помечает произведение '
+            'к пересчету.'
+        )
+        catalog_etag = client.get(self.TITLES_URL).get('ETag')
+        create_single_review(
+            moderator_client, titles[0]['id'], 'Еще отзыв', 8
+        )
+        assert client.get(self.TITLES_URL).get('ETag') == catalog_etag, (
+            'Проверьте, что в режиме `deferred` отзыв не сбрасывает кеш '
+            'каталога до пересчета рейтинга.'
+        )
+
+        call_command('run_rating_worker', '--once', stdout=StringIO())
+        assert client.get(title_url).json().get('rating') == 6, (
+            'Проверьте, что команда `run_rating_worker` пересчитывает '
+            'рейтинг помеченных произведений и сбрасывает кеш каталога.'
+        )
+        assert not RatingMark.objects.exists(), (
+            'Проверьте, что после пересчета отметки снимаются.'
+        )
+        assert dict(TitleScoreCount.objects.filter(
+            title_id=titles[0]['id']
+        ).values_list('score', 'count')) == {5: 2, 8: 1}, (
+            'Проверьте, что команда `run_rating_worker` пересчитывает '
+            'гистограмму оценок.'
+        )
+
+        admin_client.delete(self.TITLE_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id']
+        ))
+        call_command('run_rating_worker', '--once', stdout=StringIO())
+        assert not RatingMark.objects.exists(), (
+            'Проверьте, что отметки удаленных произведений снимаются.'
+        )
+
+    def test_18_reviews_export(self, client, admin_client, admin,
+                               user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        expected = sorted(
+            (
+                {key: value for key, value in review.items()
+                 if key != 'comments_count'}
+                for review in client.get(url).json()['results']
+            ),
+            key=lambda review: review['id']
+        )
+
+        response = client.get(url + 'export/')
+        assert response.status_code == HTTPStatus.OK and response.streaming, (
+            f'Проверьте, что GET-запрос к `{self.REVIEWS_URL_TEMPLATE}export/` '
+            'возвращает потоковый ответ со статусом 200.'
+        )
+        assert response['Content-Type'].startswith('application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert [json.loads(line) for line in lines] == expected, (
+            'Проверьте, что выгрузка содержит по одной строке JSON на каждый '
+            'отзыв произведения с теми же полями, что и список отзывов.'
+        )
+        response = client.get(
+            self.REVIEWS_URL_TEMPLATE.format(title_id=0) + 'export/'
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_19_reviews_etag_after_username_change(
+            self, client, admin_client, admin, user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        _, reviews, titles = create_comments(admin_client, author_map)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        comments_url = self.REVIEW_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0]['id']
+        ) + 'comments/'
+        etag = client.get(url).get('ETag')
+        comments_etag = client.get(comments_url).get('ETag')
+
+        response = admin_client.patch(
+            f'/api/v1/users/{user.username}/', data={'username': 'renamed'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK and 'renamed' in [
+            review['author'] for review in response.json()['results']
+        ], (
+            'Проверьте, что смена `username` автора меняет `ETag` списка '
+            'отзывов и ответ содержит новое имя автора.'
+        )
+        response = client.get(comments_url, HTTP_IF_NONE_MATCH=comments_etag)
+        assert response.status_code == HTTPStatus.OK and 'renamed' in [
+            comment['author'] for comment in response.json()['results']
+        ], (
+            'Проверьте, что смена `username` автора меняет `ETag` списка '
+            'комментариев.'
+        )
+
+    def test_20_rating_after_partial_review_save(self, admin_client, admin,
+                                                  user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        reviews, titles = create_reviews(admin_client, author_map)
+        for fields in (('id', 'text', 'title_id'), ('id', 'text')):
+            review = Review.objects.only(*fields).get(pk=reviews[0]['id'])
+            review.text = 'Новый текст'
+            review.save()
+            title = Title.objects.get(pk=titles[0]['id'])
+            histogram = set(TitleScoreCount.objects.filter(
+                title=title, count__gt=0
+            ).values_list('score', 'count'))
+            assert (
+                title.rating_sum, title.rating_count, histogram
+            ) == (10, 2, {(5, 2)}), (
+                'Проверьте, что сохранение отзыва, загруженного без оценки, '
+                'не учитывает его в рейтинге и гистограмме повторно.'
+            )
+
+    def test_21_reviews_etag_expires_in_other_workers(
+            self, client, admin_client, admin, settings, monkeypatch):
+        reviews, titles = create_reviews(admin_client, {admin: admin_client})
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        etag = client.get(url).get('ETag')
+
+        # Отзыв меняет другой процесс: версия в кеше этого процесса
+        # остается прежней.
+        Review.objects.filter(pk=reviews[0]['id']).update(text='Новый текст')
+        now = time.time()
+        monkeypatch.setattr(locmem, 'time', SimpleNamespace(
+            time=lambda: now + settings.CACHE_VERSION_TIMEOUT + 1
+        ))
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что версия отзывов произведения хранится в кеше '
+            'ограниченное время и изменения из других процессов '
+            'перестают отдаваться ответом 304.'
+        )
+        assert 'Новый текст' in {
+            review['text'] for review in response.json()['results']
+        }
@@ -1,8 +1,11 @@
 from http import HTTPStatus
 
 import pytest
+from django.contrib.auth import get_user_model
 
-from tests.utils import (check_fields, check_pagination, create_comments,
+from reviews.models import Comment
+from tests.utils import (check_fields, check_pagination,
+                         check_query_plans_without_sorting, create_comments,
                          create_reviews, create_single_comment)
 
 
@@ -366,3 +369,72 @@ class Test06CommentAPI:
             f'Проверьте, что PUT-запрос к `{self.COMMENT_DETAIL_URL_TEMPLATE} '
             'не предусмотрен и возвращает статус 405.'
         )
+
+    def test_08_comments_conditional_get(self, client, admin_client,
+                                         admin):
+        comments, reviews, titles = create_comments(
+            admin_client, {admin: admin_client}
+        )
+        url = self.COMMENTS_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0]['id']
+        )
+        etag = client.get(url).get('ETag')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Проверьте, что при совпадении `If-None-Match` с текущим `ETag` '
+            f'GET-запрос к `{self.COMMENTS_URL_TEMPLATE}` возвращает ответ '
+            'со статусом 304.'
+        )
+
+        admin_client.patch(
+            self.COMMENT_DETAIL_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id=reviews[0]['id'],
+                comment_id=comments[0]['id']
+            ),
+            data={'text': 'Изменено'}
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что изменение комментария меняет `ETag` списка '
+            'комментариев.'
+        )
+
+    def test_09_comments_list_query_count(
+            self, client, admin_client, admin, django_assert_num_queries):
+        _, reviews, titles = create_comments(
+            admin_client, {admin: admin_client}
+        )
+        get_user_model().objects.bulk_create(
+            get_user_model()(username=f'author{idx}',
+                             email=f'author{idx}@yamdb.fake')
+            for idx in range(100)
+        )
+        Comment.objects.bulk_create(
+            Comment(review_id=reviews[0]['id'], author=author,
+                    text='Комментарий')
+            for author in get_user_model().objects.filter(
+                username__startswith='author'
+            )
+        )
+        url = self.COMMENTS_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0]['id']
+        ) + '?limit=100'
+
+        # Отзыв, COUNT и страница комментариев вместе с авторами.
+        with django_assert_num_queries(3):
+            response = client.get(url)
+        assert len(response.json()['results']) == 100, (
+            'Проверьте, что страница комментариев загружает авторов тем же '
+            'запросом, что и комментарии.'
+        )
+
+    def test_10_comments_list_uses_index_order(self, client, admin_client,
+                                               admin):
+        _, reviews, titles = create_comments(
+            admin_client, {admin: admin_client}
+        )
+        url = self.COMMENTS_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0]['id']
+        )
+        check_query_plans_without_sorting(client, url)
+        check_query_plans_without_sorting(client, url + '?cursor=')
@@ -0,0 +1,81 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_comments
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08ChangesAPI:
+    CHANGES_URL = '/api/v1/changes/'
+    REVIEW_DETAIL_URL_TEMPLATE = (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/'
+    )
+
+    def get_all_changes(self, client, since=0, limit=2):
+        results = []
+        while True:
+            response = client.get(
+                self.CHANGES_URL, {'since': since, 'limit': limit}
+            )
+            assert response.status_code == HTTPStatus.OK, (
+                f'Проверьте, что GET-запрос к `{self.CHANGES_URL}` доступен '
+                'без авторизации.'
+            )
+            data = response.json()
+            assert len(data['results']) <= limit, (
+                'Проверьте, что лента изменений не возвращает больше '
+                '`limit` записей.'
+            )
+            results.extend(data['results'])
+            since = data['next']
+            if not data['has_more']:
+                return results, since
+
+    def test_01_changes_feed(self, client, admin_client, admin,
+                             user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        changes, since = self.get_all_changes(client)
+        assert [
+            (change['model'], change['object_id'], change['action'])
+            for change in changes
+        ] == [
+            ('review', review['id'], 'created') for review in reviews
+        ] + [
+            ('comment', comment['id'], 'created') for comment in comments
+        ], (
+            'Проверьте, что лента изменений содержит созданные отзывы и '
+            'комментарии в порядке их создания.'
+        )
+        assert [change['id'] for change in changes] == sorted(
+            change['id'] for change in changes
+        )
+        assert all(
+            change['title_id'] == titles[0]['id'] for change in changes
+        ), (
+            'Проверьте, что записи ленты изменений содержат `title_id`.'
+        )
+
+        admin_client.delete(self.REVIEW_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0]['id']
+        ))
+        changes, _ = self.get_all_changes(client, since)
+        assert sorted(
+            (change['model'], change['object_id'], change['action'])
+            for change in changes
+        ) == sorted(
+            [('comment', comment['id'], 'deleted') for comment in comments]
+            + [('review', reviews[0]['id'], 'deleted')]
+        ), (
+            'Проверьте, что лента изменений после курсора `since` содержит '
+            'только новые записи, в том числе об удалении.'
+        )
+
+    def test_02_changes_invalid_params(self, client):
+        for params in ({'since': 'abc'}, {'since': -1}, {'limit': 'x'}):
+            response = client.get(self.CHANGES_URL, params)
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                'Проверьте, что некорректные `since` и `limit` возвращают '
+                'ответ со статусом 400.'
+            )
@@ -1,5 +1,8 @@
 from http import HTTPStatus
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 
 check_name_and_slug_patterns = (
     (
@@ -305,3 +308,24 @@ def check_fields(obj_type, url_pattern, obj, expected_data, detail=False):
         f'данные {obj_types[obj_type]}{results_in_msg}. Поле `id` не '
         'найдено или не является целым числом.'
     )
+
+
+def check_query_plans_without_sorting(client, url):
+    """Проверяет, что SELECT-запросы эндпоинта не сортируют во временном
+    B-дереве, а читают строки в нужном порядке из индекса."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    with connection.cursor() as cursor:
+        for query in context.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+            plan = [row[-1] for row in cursor.fetchall()]
+            assert not any(
+                step.startswith('USE TEMP B-TREE') and 'ORDER BY' in step
+                for step in plan
+            ), (
+                f'Проверьте, что GET-запрос к `{url}` использует индекс '
+                f'для сортировки. Запрос: {query["sql"]}, план: {plan}'
+            )